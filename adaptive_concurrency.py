@@ -0,0 +1,149 @@
+import csv
+import time
+import threading
+from tqdm import tqdm
+
+
+class AimdController:
+    """
+    Limit on in-flight model requests, tuned from observed throughput and latency.
+
+    Requests are grouped into windows of ``2 * limit`` completions. After each window the
+    limit grows by one (additive increase) while throughput keeps rising, settles on the
+    best limit seen once it stops rising, and is halved (multiplicative decrease) on a
+    failed or timed-out request or when latency jumps without a throughput gain. Requests
+    that were already in flight at a cut belong to the same congestion event, so their
+    failures do not cut again. The best throughput slowly decays while holding, so the
+    controller probes again when the server's capacity changes.
+
+    Usage::
+
+        controller.acquire()
+        start = time.perf_counter()
+        ...  # send the request
+        controller.release(time.perf_counter() - start, ok)
+    """
+
+    def __init__(self, maximum, initial=1, minimum=1, backoff=0.5, latency_spike=1.5, gain=0.05, decay=0.99, log_path=None):
+        """
+        Args:
+            maximum (int): Upper bound on the limit, normally the number of worker threads.
+            initial (int): Starting limit.
+            minimum (int): Lower bound on the limit.
+            backoff (float): Factor the limit is multiplied by on failures and latency spikes.
+            latency_spike (float): Median latency growth between windows that counts as a spike.
+            gain (float): Relative throughput gain required to keep increasing.
+            decay (float): Per-window decay of the best throughput while holding.
+            log_path (str): CSV file that receives one row per window (the throughput curve).
+        """
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = max(minimum, min(initial, maximum))
+        self.backoff = backoff
+        self.latency_spike = latency_spike
+        self.gain = gain
+        self.decay = decay
+        self.in_flight = 0
+
+        self._condition = threading.Condition()
+        self._started = time.monotonic()
+        self._best_throughput = 0.0
+        self._best_limit = self.limit
+        self._previous_latency = None
+        # Requests still in flight since the last failure cut; their failures are not new events.
+        self._draining = 0
+        self._reset_window()
+
+        self._log_file = None
+        if log_path:
+            self._log_file = open(log_path, 'w', newline='', encoding='utf-8')
+            self._log = csv.writer(self._log_file)
+            self._log.writerow(['elapsed_s', 'limit', 'requests_per_min', 'median_latency_s', 'failures', 'event'])
+
+    def _reset_window(self):
+        self._window_start = time.monotonic()
+        self._completed = 0
+        self._failures = 0
+        self._latencies = []
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, ok):
+        """
+        Report a finished request.
+
+        Args:
+            latency (float): Seconds the request took (excluding the wait in :meth:`acquire`).
+            ok (bool): False for timeouts and other failures.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if ok:
+                self._completed += 1
+                self._latencies.append(latency)
+            else:
+                self._failures += 1
+
+            same_event = self._draining > 0
+            if same_event:
+                self._draining -= 1
+
+            if not ok:
+                if not same_event:
+                    self._end_window(failed=True)
+                    self._draining = self.in_flight
+            elif self._completed >= 2 * self.limit:
+                self._end_window(failed=False)
+            self._condition.notify_all()
+
+    def _end_window(self, failed):
+        elapsed = max(time.monotonic() - self._window_start, 1e-6)
+        throughput = self._completed / elapsed
+        latency = sorted(self._latencies)[len(self._latencies) // 2] if self._latencies else None
+        previous_limit = self.limit
+
+        if failed:
+            event = 'failure'
+            self._decrease()
+        elif (self._previous_latency is not None and latency > self._previous_latency * self.latency_spike
+              and throughput <= self._best_throughput):
+            event = 'latency spike'
+            self._decrease()
+        elif throughput > self._best_throughput * (1 + self.gain):
+            event = 'throughput rising'
+            self._best_throughput = throughput
+            self._best_limit = self.limit
+            self.limit = min(self.limit + 1, self.maximum)
+        else:
+            event = 'saturated'
+            self.limit = self._best_limit
+            self._best_throughput *= self.decay
+
+        if self.limit != previous_limit:
+            tqdm.write(f"In-flight limit {previous_limit} -> {self.limit} ({event}, {throughput * 60:.1f} requests/min).")
+        if self._log_file:
+            self._log.writerow([f"{time.monotonic() - self._started:.1f}", previous_limit, f"{throughput * 60:.2f}",
+                                f"{latency:.2f}" if latency is not None else '', self._failures, event])
+            self._log_file.flush()
+
+        if event in ('throughput rising', 'saturated'):
+            self._previous_latency = latency
+        self._reset_window()
+
+    def _decrease(self):
+        self.limit = max(self.minimum, int(self.limit * self.backoff))
+        self._best_limit = min(self._best_limit, self.limit)
+        # Forget the old peak so the limit can climb again from here.
+        self._best_throughput = 0.0
+        self._previous_latency = None
+
+    def close(self):
+        """Close the throughput log."""
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
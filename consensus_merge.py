@@ -0,0 +1,198 @@
+import re
+import pytesseract
+from PIL import Image
+
+from persian_text import normalize
+
+_TOKEN_RE = re.compile(r'\S+')
+
+
+def tesseract_words(image_path, lang='fas'):
+    """
+    Run Tesseract once and return both its plain text and per-word confidences.
+
+    Args:
+        image_path (str): Path to the image (a PIL image is accepted as well).
+        lang (str): Tesseract language/traineddata name.
+
+    Returns:
+        tuple: ``(text, words)`` where ``words`` is a list of ``(word, confidence)`` pairs
+        with confidence in the 0-100 range. On failure ``text`` holds the error message
+        and ``words`` is empty.
+    """
+    try:
+        image = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
+        data = pytesseract.image_to_data(image, lang, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        return f"Error processing with Tesseract: {str(e)}", []
+
+    words = []
+    lines = []
+    current_line = None
+    current_paragraph = None
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        conf = float(data['conf'][i])
+        if not word or conf < 0:
+            continue
+        paragraph = (data['block_num'][i], data['par_num'][i])
+        line = paragraph + (data['line_num'][i],)
+        if line != current_line:
+            if current_paragraph is not None and paragraph != current_paragraph:
+                lines.append('')
+            lines.append(word)
+            current_line, current_paragraph = line, paragraph
+        else:
+            lines[-1] += ' ' + word
+        words.append((word, conf))
+    return '\n'.join(lines) + '\n', words
+
+
+def align_tokens(a, b, band=32):
+    """
+    Align two token sequences with a banded Levenshtein distance.
+
+    Only cells within ``band`` (plus the length difference) of the diagonal are computed,
+    so the cost is O(len * band) instead of O(len(a) * len(b)).
+
+    Args:
+        a (list): First sequence (already normalised).
+        b (list): Second sequence (already normalised).
+        band (int): Extra half-width of the band around the diagonal.
+
+    Returns:
+        list: ``(i, j)`` pairs in order; ``i`` or ``j`` is None for tokens only present in
+        the other sequence.
+    """
+    n, m = len(a), len(b)
+    width = abs(n - m) + band
+    inf = n + m + 1
+    rows = []
+
+    for i in range(n + 1):
+        lo, hi = max(0, i - width), min(m, i + width)
+        row = [inf] * (hi - lo + 1)
+        if i == 0:
+            for j in range(lo, hi + 1):
+                row[j - lo] = j
+        else:
+            prev_lo, prev = rows[-1]
+            prev_hi = prev_lo + len(prev) - 1
+            for j in range(lo, hi + 1):
+                best = inf
+                if prev_lo <= j <= prev_hi:
+                    best = prev[j - prev_lo] + 1
+                if j == 0:
+                    best = min(best, i)
+                else:
+                    if j - 1 >= lo:
+                        best = min(best, row[j - 1 - lo] + 1)
+                    if prev_lo <= j - 1 <= prev_hi:
+                        best = min(best, prev[j - 1 - prev_lo] + (a[i - 1] != b[j - 1]))
+                row[j - lo] = best
+        rows.append((lo, row))
+
+    def cost(i, j):
+        lo, row = rows[i]
+        return row[j - lo] if lo <= j < lo + len(row) else inf
+
+    pairs = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        here = cost(i, j)
+        if i > 0 and j > 0 and here == cost(i - 1, j - 1) + (a[i - 1] != b[j - 1]):
+            pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif i > 0 and here == cost(i - 1, j) + 1:
+            pairs.append((i - 1, None))
+            i -= 1
+        else:
+            pairs.append((None, j - 1))
+            j -= 1
+    pairs.reverse()
+    return pairs
+
+
+def merge_ocr(llm_text, words, llm_weight=0.75, margin=0.1, band=32):
+    """
+    Merge a model transcription with Tesseract words by per-token voting.
+
+    The model text provides the layout. Where the two disagree, the model token carries a
+    fixed weight and the Tesseract word its confidence / 100; the heavier one wins. Votes
+    closer than ``margin`` and confident Tesseract words the model skipped are left as the
+    model wrote them and reported as unresolved.
+
+    Args:
+        llm_text (str): Transcription returned by the vision model.
+        words (list): ``(word, confidence)`` pairs from :func:`tesseract_words`.
+        llm_weight (float): Vote weight of a model token, on the same 0-1 scale as Tesseract confidence.
+        margin (float): Minimum vote difference needed to resolve a disagreement.
+        band (int): Alignment band, see :func:`align_tokens`.
+
+    Returns:
+        tuple: ``(merged_text, unresolved)`` where ``unresolved`` is a list of
+        ``(model_span, tesseract_span)`` string pairs.
+    """
+    matches = list(_TOKEN_RE.finditer(llm_text))
+    llm_tokens = [normalize(match.group()) for match in matches]
+    tess_tokens = [normalize(word) for word, _ in words]
+
+    replacements = {}
+    unresolved = []
+    open_span = None
+
+    def flag(llm_index, tess_index):
+        nonlocal open_span
+        if open_span is None:
+            open_span = ([], [])
+            unresolved.append(open_span)
+        if llm_index is not None:
+            open_span[0].append(matches[llm_index].group())
+        if tess_index is not None:
+            open_span[1].append(words[tess_index][0])
+
+    for i, j in align_tokens(llm_tokens, tess_tokens, band):
+        if i is not None and j is not None and llm_tokens[i] == tess_tokens[j]:
+            open_span = None
+            continue
+        if i is None:
+            # Only Tesseract saw this word; surface it if Tesseract is sure, otherwise treat it as noise.
+            if words[j][1] / 100 >= llm_weight + margin:
+                flag(None, j)
+            else:
+                open_span = None
+            continue
+        if j is None:
+            open_span = None
+            continue
+
+        tess_vote = words[j][1] / 100
+        if tess_vote >= llm_weight + margin:
+            replacements[i] = words[j][0]
+            open_span = None
+        elif tess_vote <= llm_weight - margin:
+            open_span = None
+        else:
+            flag(i, j)
+
+    pieces = []
+    position = 0
+    for index, match in enumerate(matches):
+        pieces.append(llm_text[position:match.start()])
+        pieces.append(replacements.get(index, match.group()))
+        position = match.end()
+    pieces.append(llm_text[position:])
+
+    return ''.join(pieces), [(' '.join(llm_span), ' '.join(tess_span)) for llm_span, tess_span in unresolved]
+
+
+def unresolved_ratio(llm_text, unresolved):
+    """Fraction of model tokens that ended up in an unresolved span."""
+    total = len(_TOKEN_RE.findall(llm_text))
+    flagged = sum(len(llm_span.split()) or 1 for llm_span, _ in unresolved)
+    return flagged / total if total else 0.0
+
+
+def format_unresolved(unresolved):
+    """Render unresolved spans for the ``_consensus_flags.txt`` side file."""
+    return ''.join(f"model: {llm_span}\ntesseract: {tess_span}\n\n" for llm_span, tess_span in unresolved)
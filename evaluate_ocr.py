@@ -0,0 +1,227 @@
+import os
+import re
+import csv
+import math
+import time
+import tempfile
+import argparse
+import numpy as np
+from tqdm import tqdm
+
+import image_ocr_processor as ollama_processor
+import image_ocr_processor_lmstudio as lmstudio_processor
+from llm_server import warm_up_ollama, warm_up_lmstudio
+from persian_text import normalize
+
+CONFIGURATIONS = ('tesseract:fas', 'tesseract:fas2', 'ollama', 'ollama:two-step', 'ollama:consensus', 'lmstudio:two-step')
+
+# Markdown the models like to add around tables and headings; it is not part of the page text.
+_MARKUP_RE = re.compile(r'[|*#]|-{3,}')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_for_scoring(text):
+    """Normalise Persian spelling variants, drop markdown and collapse all whitespace."""
+    return _SPACE_RE.sub(' ', _MARKUP_RE.sub(' ', normalize(text))).strip()
+
+
+def edit_distance(a, b):
+    """
+    Levenshtein distance between two integer sequences.
+
+    Each DP row is computed with NumPy: substitutions and deletions element-wise from the
+    previous row, insertions with a running minimum, since
+    ``row[j] = min_k(row[k] + j - k) = j + min_k(row[k] - k)``.
+
+    Args:
+        a (numpy.ndarray): First sequence.
+        b (numpy.ndarray): Second sequence.
+
+    Returns:
+        int: The edit distance.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if len(b) == 0:
+        return len(a)
+
+    offsets = np.arange(len(b) + 1)
+    row = offsets.copy()
+    for i, symbol in enumerate(a, 1):
+        next_row = np.empty_like(row)
+        next_row[0] = i
+        np.minimum(row[1:] + 1, row[:-1] + (b != symbol), out=next_row[1:])
+        row = np.minimum.accumulate(next_row - offsets) + offsets
+    return int(row[-1])
+
+
+def error_rates(hypothesis, reference):
+    """
+    Character and word error rate of an OCR output against the ground truth.
+
+    Returns:
+        tuple: (char_errors, ref_chars, word_errors, ref_words), so rates can be pooled over pages.
+    """
+    hypothesis = normalize_for_scoring(hypothesis)
+    reference = normalize_for_scoring(reference)
+
+    char_errors = edit_distance(np.frombuffer(hypothesis.encode('utf-32-le'), dtype=np.uint32),
+                                np.frombuffer(reference.encode('utf-32-le'), dtype=np.uint32))
+
+    vocabulary = {}
+    hyp_words = np.array([vocabulary.setdefault(w, len(vocabulary)) for w in hypothesis.split()], dtype=np.int64)
+    ref_words = np.array([vocabulary.setdefault(w, len(vocabulary)) for w in reference.split()], dtype=np.int64)
+    word_errors = edit_distance(hyp_words, ref_words)
+
+    return char_errors, len(reference), word_errors, len(ref_words)
+
+
+def _failure(*texts):
+    """Return the first error message among step outputs (the processors return errors as text)."""
+    return next((text for text in texts if text and text.startswith("Error ")), None)
+
+
+def run_configuration(config, image_path, stats, work_folder, max_unresolved=0.15):
+    """
+    Run one processor configuration on a page.
+
+    ``work_folder`` receives side files such as the consensus flags; ``max_unresolved`` is
+    the consensus fallback threshold, as in the processor's ``--max-unresolved``.
+
+    Returns:
+        tuple: ``(text, error)``; ``error`` is the message of a failed Tesseract or model step, else None.
+    """
+    engine, _, variant = config.partition(':')
+    if engine == 'tesseract':
+        text = ollama_processor.process_image_with_tesseract(image_path, variant)
+        return text, _failure(text)
+
+    if engine == 'lmstudio':
+        try:
+            tesseract_text = lmstudio_processor.process_image_with_tesseract(image_path)
+        except Exception as e:
+            return "", f"Error processing with Tesseract: {e}"
+        text = lmstudio_processor.process_image_with_lmstudio(image_path, tesseract_text, stats=stats)
+        return text, _failure(text)
+
+    if variant == 'consensus':
+        # The same path as --two-step --refine consensus, including the fallback to model refinement.
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        tesseract_text, initial, final = ollama_processor.refine_with_consensus(
+            image_path, work_folder, base_name, max_unresolved, stats=stats)
+        text = final if final is not None else initial
+        return text, _failure(tesseract_text, initial, text)
+
+    tesseract_text = ollama_processor.process_image_with_tesseract(image_path)
+    initial, final = ollama_processor.process_image_with_ollama(image_path, tesseract_text, variant == 'two-step', stats=stats)
+    text = final if final is not None else initial
+    return text, _failure(tesseract_text, initial, text)
+
+
+def evaluate(images_folder, truth_folder, configs, limit=None, max_unresolved=0.15):
+    """
+    Score each configuration on every page that has a ground-truth file.
+
+    Ground truth for ``page.jpg`` is ``page.txt`` in ``truth_folder``.
+
+    Returns:
+        list: One dict of accuracy and cost figures per configuration.
+    """
+    pages = []
+    for image_file in sorted(os.listdir(images_folder)):
+        base_name, ext = os.path.splitext(image_file)
+        truth_path = os.path.join(truth_folder, f"{base_name}.txt")
+        if ext.lower() in ('.png', '.jpg', '.jpeg') and os.path.exists(truth_path):
+            with open(truth_path, 'r', encoding='utf-8') as f:
+                pages.append((os.path.join(images_folder, image_file), f.read()))
+    pages = pages[:limit] if limit else pages
+    if not pages:
+        raise SystemExit(f"No images in '{images_folder}' have a ground-truth .txt in '{truth_folder}'.")
+
+    rows = []
+    for config in configs:
+        # Load the model outside the timed loop so one-off load time does not skew the per-page cost.
+        if config.startswith('ollama'):
+            warm_up_ollama(ollama_processor.OLLAMA_MODEL, ollama_processor.DEFAULT_NUM_CTX, ollama_processor.DEFAULT_KEEP_ALIVE)
+        elif config.startswith('lmstudio'):
+            warm_up_lmstudio(lmstudio_processor.LMSTUDIO_MODEL, lmstudio_processor.DEFAULT_TTL)
+
+        stats = {}
+        seconds = 0.0
+        failures = 0
+        totals = np.zeros(4, dtype=np.int64)
+        with tempfile.TemporaryDirectory() as work_folder:
+            for image_path, truth in tqdm(pages, desc=config):
+                start = time.perf_counter()
+                text, error = run_configuration(config, image_path, stats, work_folder, max_unresolved)
+                seconds += time.perf_counter() - start
+                if error:
+                    # A failed step says nothing about accuracy; it is counted, not scored.
+                    tqdm.write(f"{config}: {os.path.basename(image_path)}: {error}")
+                    failures += 1
+                else:
+                    totals += error_rates(text, truth)
+
+        char_errors, ref_chars, word_errors, ref_words = totals
+        scored = failures < len(pages)
+        rows.append({
+            'config': config,
+            'pages': len(pages),
+            'failures': failures,
+            'cer': char_errors / max(ref_chars, 1) if scored else math.nan,
+            'wer': word_errors / max(ref_words, 1) if scored else math.nan,
+            'seconds_per_page': seconds / len(pages),
+            'tokens_per_page': (stats.get('prompt_tokens', 0) + stats.get('completion_tokens', 0)) / len(pages),
+            'kb_per_page': stats.get('request_bytes', 0) / 1024 / len(pages),
+        })
+
+    for row in rows:
+        row['pareto'] = not math.isnan(row['cer']) and not any(
+            other['cer'] <= row['cer'] and other['seconds_per_page'] <= row['seconds_per_page']
+            and (other['cer'] < row['cer'] or other['seconds_per_page'] < row['seconds_per_page'])
+            for other in rows
+        )
+    return rows
+
+
+def print_table(rows, max_cer=None):
+    """
+    Print the results ordered by cost, marking Pareto-optimal configurations and the cheapest one meeting ``max_cer``.
+
+    CER and WER only cover pages that did not fail; a configuration with failed pages never counts as meeting ``max_cer``.
+    """
+    rows = sorted(rows, key=lambda row: row['seconds_per_page'])
+    print(f"\n{'configuration':<20}{'CER':>8}{'WER':>8}{'failed':>8}{'s/page':>10}{'tokens/page':>13}{'KB/page':>10}  pareto")
+    for row in rows:
+        cer = 'n/a' if math.isnan(row['cer']) else f"{row['cer']:.2%}"
+        wer = 'n/a' if math.isnan(row['wer']) else f"{row['wer']:.2%}"
+        print(f"{row['config']:<20}{cer:>8}{wer:>8}{row['failures']:>8}{row['seconds_per_page']:>10.2f}"
+              f"{row['tokens_per_page']:>13.0f}{row['kb_per_page']:>10.1f}  {'*' if row['pareto'] else ''}")
+
+    if max_cer is not None:
+        acceptable = [row for row in rows if not row['failures'] and row['cer'] <= max_cer]
+        if acceptable:
+            print(f"\nCheapest configuration with CER <= {max_cer:.2%}: {acceptable[0]['config']}")
+        else:
+            print(f"\nNo configuration reaches CER <= {max_cer:.2%}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare OCR configurations on a ground-truth page set: accuracy (CER/WER) against cost per page.')
+    parser.add_argument('-i', '--images', required=True, help='Folder with the page images.')
+    parser.add_argument('-t', '--truth', help='Folder with ground-truth <page>.txt files (default: the images folder).')
+    parser.add_argument('-c', '--configs', nargs='+', choices=CONFIGURATIONS, default=list(CONFIGURATIONS), help='Configurations to evaluate.')
+    parser.add_argument('-n', '--limit', type=int, help='Only use the first N labelled pages.')
+    parser.add_argument('--max-unresolved', type=float, default=0.15, help='Consensus fallback threshold, as in image_ocr_processor.py.')
+    parser.add_argument('--max-cer', type=float, help='Quality bar (e.g. 0.03); the cheapest configuration meeting it is reported.')
+    parser.add_argument('--csv', help='Also write the results to this CSV file.')
+
+    args = parser.parse_args()
+    results = evaluate(args.images, args.truth or args.images, args.configs, args.limit, args.max_unresolved)
+    print_table(results, args.max_cer)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
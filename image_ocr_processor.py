@@ -1,5 +1,10 @@
 import os
+import io
+import json
 import base64
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 import pytesseract
 import requests
@@ -7,6 +12,20 @@ import argparse
 from tqdm import tqdm
 import time
 
+from llm_server import OLLAMA_URL, warm_up_ollama, PAGE_NUM_PREDICT
+from consensus_merge import tesseract_words, merge_ocr, unresolved_ratio, format_unresolved
+from split_images import split_halves
+from watch_folder import watch_images
+from pdf_pages import read_text_layer, has_text_layer, render_pdf_pages, pdf_page_file
+from adaptive_concurrency import AimdController
+from preprocess_image import Preprocessor, add_arguments as add_preprocess_arguments, options_from_args as preprocess_options_from_args
+
+INPUT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.pdf')
+
+# Set by main()/watch() when several pages are processed concurrently; gates every model request.
+request_controller = None
+stats_lock = threading.Lock()
+
 def post_with_retry(url, json_payload, retries=3, timeout=180):
     """
     Sends a POST request with a timeout and retry mechanism.
@@ -19,47 +38,91 @@ def post_with_retry(url, json_payload, retries=3, timeout=180):
         
     Returns:
         requests.Response or None: The response object on success, or None on failure.
+
+    When ``request_controller`` is set, each attempt waits for a free in-flight slot and
+    reports its latency and outcome back to the controller.
     """
     for attempt in range(retries):
+        controller = request_controller
+        if controller is not None:
+            controller.acquire()
+        start = time.perf_counter()
+        ok = False
         try:
             response = requests.post(url, json=json_payload, timeout=timeout)
             response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+            ok = True
             return response  # Success
         except requests.exceptions.Timeout:
             tqdm.write(f"Request timed out (attempt {attempt + 1}/{retries}). Retrying in 5 seconds...")
-            time.sleep(5)
         except requests.exceptions.RequestException as e:
             tqdm.write(f"Request failed: {e} (attempt {attempt + 1}/{retries}). Retrying in 5 seconds...")
-            time.sleep(5)
+        finally:
+            if controller is not None:
+                controller.release(time.perf_counter() - start, ok)
+        time.sleep(5)
             
     tqdm.write("All retry attempts failed.")
     return None
 
-def process_image_with_tesseract(image_path):
-    """Perform OCR using Tesseract"""
+OLLAMA_MODEL = "gemma3:27b-it-q8_0"  # Ensure this multimodal model is available
+DEFAULT_NUM_CTX = 8192
+DEFAULT_KEEP_ALIVE = "30m"
+
+def record_ollama_usage(stats, payload, result):
+    """
+    Accumulate request size, token counts and load timings reported by Ollama into ``stats``.
+
+    A non-trivial ``load_duration`` on a page request means the model was (re)loaded
+    mid-run; it is counted separately so page latency is not inflated by it.
+    """
+    load_seconds = result.get('load_duration', 0) / 1e9
+    if load_seconds > 1:
+        tqdm.write(f"Model was reloaded during a page request ({load_seconds:.1f} s).")
+        stats['reloads'] = stats.get('reloads', 0) + 1
+    stats['load_seconds'] = stats.get('load_seconds', 0.0) + load_seconds
+    stats['requests'] = stats.get('requests', 0) + 1
+    stats['request_bytes'] = stats.get('request_bytes', 0) + len(json.dumps(payload).encode('utf-8'))
+    stats['prompt_tokens'] = stats.get('prompt_tokens', 0) + result.get('prompt_eval_count', 0)
+    stats['completion_tokens'] = stats.get('completion_tokens', 0) + result.get('eval_count', 0)
+
+def process_image_with_tesseract(image_path, lang='fas'):
+    """Perform OCR using Tesseract (accepts a path or an in-memory PIL image)"""
     try:
-        image = Image.open(image_path)
-        text = pytesseract.image_to_string(image, 'fas')  # Language set to Farsi ('fas')
+        image = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
+        text = pytesseract.image_to_string(image, lang)  # Language defaults to Farsi ('fas')
         return text
     except Exception as e:
         return f"Error processing with Tesseract: {str(e)}"
 
 def encode_image(image_path):
-    """Encode image to a base64 string"""
+    """Encode image (a path or an in-memory PIL image) to a base64 string"""
+    if isinstance(image_path, Image.Image):
+        buffer = io.BytesIO()
+        image_path.convert('RGB').save(buffer, format='JPEG', quality=95)
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-def process_image_with_ollama(image_path, tesseract_text, use_two_step=False):
+def process_image_with_ollama(image_path, tesseract_text, use_two_step=False, initial_response=None,
+                              num_ctx=DEFAULT_NUM_CTX, keep_alive=DEFAULT_KEEP_ALIVE, stats=None):
     """
     Process an image using the native Ollama API.
+
+    If ``initial_response`` is given, the initial OCR request is skipped and only the
+    refinement step is sent (``use_two_step`` is implied). ``num_ctx`` must be the same for
+    every request of a run, otherwise Ollama reloads the model; generation is capped at
+    ``PAGE_NUM_PREDICT`` tokens. Timings and token counts are added to ``stats`` when a
+    dict is given.
     
     Returns:
         tuple: A tuple containing (initial_response, final_response).
     """
     encoded_image = encode_image(image_path)
     
-    ollama_endpoint = 'http://localhost:11434/api/chat'
-    model_name = "gemma3:27b-it-q8_0"  # Ensure this multimodal model is available
+    ollama_endpoint = f'{OLLAMA_URL}/api/chat'
+    model_name = OLLAMA_MODEL
+    options = {"num_ctx": num_ctx, "num_predict": PAGE_NUM_PREDICT}
 
     initial_messages = [
         {
@@ -69,18 +132,23 @@ def process_image_with_ollama(image_path, tesseract_text, use_two_step=False):
         }
     ]
 
-    initial_payload = { "model": model_name, "messages": initial_messages, "stream": False }
+    initial_payload = { "model": model_name, "messages": initial_messages, "stream": False, "keep_alive": keep_alive, "options": options }
 
     try:
-        # Initial request with retry
-        response = post_with_retry(ollama_endpoint, json_payload=initial_payload)
-        if response is None:
-            raise requests.exceptions.RequestException("Initial request failed after multiple retries.")
-        
-        result = response.json()
-        initial_response_content = result['message']['content']
+        if initial_response is not None:
+            initial_response_content = initial_response
+        else:
+            # Initial request with retry
+            response = post_with_retry(ollama_endpoint, json_payload=initial_payload)
+            if response is None:
+                raise requests.exceptions.RequestException("Initial request failed after multiple retries.")
+
+            result = response.json()
+            initial_response_content = result['message']['content']
+            if stats is not None:
+                record_ollama_usage(stats, initial_payload, result)
 
-        if not use_two_step:
+        if not use_two_step and initial_response is None:
             return initial_response_content, None
 
         # Two-Step Refinement Process
@@ -90,14 +158,17 @@ def process_image_with_ollama(image_path, tesseract_text, use_two_step=False):
             { "role": "user", "content": f"Combine your OCR results with this Tesseract output and refine your response: {tesseract_text}" }
         ]
         
-        follow_up_payload = { "model": model_name, "messages": follow_up_messages, "stream": False }
+        follow_up_payload = { "model": model_name, "messages": follow_up_messages, "stream": False, "keep_alive": keep_alive, "options": options }
         
         # Follow-up request with retry
         follow_up_response = post_with_retry(ollama_endpoint, json_payload=follow_up_payload)
         if follow_up_response is None:
             raise requests.exceptions.RequestException("Follow-up request failed after multiple retries.")
 
-        final_response_content = follow_up_response.json()['message']['content']
+        follow_up_result = follow_up_response.json()
+        final_response_content = follow_up_result['message']['content']
+        if stats is not None:
+            record_ollama_usage(stats, follow_up_payload, follow_up_result)
         return initial_response_content, final_response_content
 
     except requests.exceptions.RequestException as e:
@@ -107,51 +178,136 @@ def process_image_with_ollama(image_path, tesseract_text, use_two_step=False):
         error_message = f"Error parsing Ollama response: {str(e)}."
         return error_message, None
 
-def main(folder_path, output_folder, use_two_step):
-    """Main function to process all images in a folder with resume capability."""
-    os.makedirs(output_folder, exist_ok=True)
+def refine_with_consensus(image_path, output_folder, base_name, max_unresolved,
+                          num_ctx=DEFAULT_NUM_CTX, keep_alive=DEFAULT_KEEP_ALIVE, stats=None, tesseract_image=None):
+    """
+    Refine a page by merging the model and Tesseract outputs locally instead of a second model call.
 
-    image_files = sorted([f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg'))])
+    Pages whose unresolved share exceeds ``max_unresolved``, or for which Tesseract found no
+    words, fall back to the model refinement. ``tesseract_image`` (e.g. a preprocessed copy) is given to Tesseract instead of ``image_path``.
 
-    for image_file in tqdm(image_files, desc="Processing images") as pbar:
-        base_name = os.path.splitext(image_file)[0]
-        image_path = os.path.join(folder_path, image_file)
-        
-        # Resume Capability
-        final_ollama_output_path = os.path.join(output_folder, f"{base_name}_ollama.txt")
-        if os.path.exists(final_ollama_output_path):
-            tqdm.write(f"Skipping '{image_file}' as it has already been processed.")
-            continue
-
-        # Processing
-        tesseract_text = process_image_with_tesseract(image_path)
-        ollama_initial, ollama_final = process_image_with_ollama(image_path, tesseract_text, use_two_step)
-        
-        final_ollama_text = ollama_final if use_two_step and ollama_final is not None else ollama_initial
-        
-        # Saving Individual Files
-        tesseract_output_file = os.path.join(output_folder, f"{base_name}_tesseract.txt")
-        with open(tesseract_output_file, 'w', encoding='utf-8') as tes_file:
-            tes_file.write(tesseract_text)
-        
-        # If in two-step mode, save the intermediate AI response
-        if use_two_step:
-            intermediate_output_file = os.path.join(output_folder, f"{base_name}_ollama_intermediate.txt")
-            with open(intermediate_output_file, 'w', encoding='utf-8') as inter_file:
-                inter_file.write(ollama_initial or "")
-
-        with open(final_ollama_output_path, 'w', encoding='utf-8') as ollama_file:
-            ollama_file.write(final_ollama_text or "")
-        
-    # Aggregation Step
-    tqdm.write("\nJob complete. Aggregating all results...")
+    Returns:
+        tuple: (tesseract_text, ollama_initial, ollama_final), as produced by the two-step path.
+    """
+    tesseract_text, words = tesseract_words(tesseract_image if tesseract_image is not None else image_path, 'fas')
+    ollama_initial, _ = process_image_with_ollama(image_path, tesseract_text, num_ctx=num_ctx, keep_alive=keep_alive, stats=stats)
+    if ollama_initial.startswith("Error "):
+        return tesseract_text, ollama_initial, None
+
+    flags_path = os.path.join(output_folder, f"{base_name}_consensus_flags.txt")
+    if not words:
+        # Without Tesseract words no disagreement can be decided, so the merge would just return the first pass.
+        tqdm.write(f"'{base_name}': no Tesseract word confidences, refining with the model.")
+        if os.path.exists(flags_path):
+            os.remove(flags_path)
+        _, ollama_final = process_image_with_ollama(image_path, tesseract_text, initial_response=ollama_initial,
+                                                    num_ctx=num_ctx, keep_alive=keep_alive, stats=stats)
+        return tesseract_text, ollama_initial, ollama_final
+
+    merged, unresolved = merge_ocr(ollama_initial, words)
+    if unresolved:
+        with open(flags_path, 'w', encoding='utf-8') as flags_file:
+            flags_file.write(format_unresolved(unresolved))
+    elif os.path.exists(flags_path):
+        os.remove(flags_path)
+
+    if unresolved_ratio(ollama_initial, unresolved) > max_unresolved:
+        tqdm.write(f"'{base_name}': too many unresolved spans, refining with the model.")
+        _, ollama_final = process_image_with_ollama(image_path, tesseract_text, initial_response=ollama_initial,
+                                                    num_ctx=num_ctx, keep_alive=keep_alive, stats=stats)
+        return tesseract_text, ollama_initial, ollama_final
+
+    return tesseract_text, ollama_initial, merged
+
+def page_names(image_file, split):
+    """Names of the pages an input file yields; split halves follow split_images.py naming."""
+    if not split:
+        return [image_file]
+    name, ext = os.path.splitext(image_file)
+    return [f"{name}_part1{ext}", f"{name}_part2{ext}"]
+
+def load_pages(image_path, split):
+    """Images for the pages of an input image (a path or a PIL image): itself, or its two halves split in memory."""
+    if not split:
+        return [image_path]
+    if isinstance(image_path, Image.Image):
+        return list(split_halves(image_path))
+    with Image.open(image_path) as img:
+        return list(split_halves(img))
+
+def is_processed(output_folder, page_file):
+    """Resume check: a page is done once its final output file exists."""
+    return os.path.exists(os.path.join(output_folder, f"{os.path.splitext(page_file)[0]}_ollama.txt"))
+
+def process_page(image, page_file, output_folder, use_two_step, refine, max_unresolved, num_ctx, keep_alive, stats,
+                 cleaning=None, clean_for_model=False):
+    """
+    OCR one page and save its individual output files.
+
+    Args:
+        image (str or PIL.Image.Image): Path of the page image, or the page itself.
+        page_file (str): Page file name; output files are named after it.
+        cleaning (concurrent.futures.Future): Cleaned page from Preprocessor.submit, used for Tesseract.
+        clean_for_model (bool): Also send the cleaned page to the model.
+
+    Pages may run on several threads at once: usage is collected per page and merged
+    into the shared ``stats`` (including ``page_seconds`` and ``pages``) under a lock.
+
+    Returns:
+        float: Seconds spent on the page, excluding any model load time.
+    """
+    base_name = os.path.splitext(page_file)[0]
+    final_ollama_output_path = os.path.join(output_folder, f"{base_name}_ollama.txt")
+
+    # Processing
+    page_stats = {}
+    page_start = time.perf_counter()
+    tesseract_image = model_image = image
+    if cleaning is not None:
+        tesseract_image = cleaning.result()
+        if clean_for_model:
+            model_image = tesseract_image
+    if use_two_step and refine == 'consensus':
+        tesseract_text, ollama_initial, ollama_final = refine_with_consensus(
+            model_image, output_folder, base_name, max_unresolved, num_ctx, keep_alive, page_stats, tesseract_image)
+    else:
+        tesseract_text = process_image_with_tesseract(tesseract_image)
+        ollama_initial, ollama_final = process_image_with_ollama(
+            model_image, tesseract_text, use_two_step, num_ctx=num_ctx, keep_alive=keep_alive, stats=page_stats)
+    page_seconds = max(0.0, time.perf_counter() - page_start - page_stats.get('load_seconds', 0.0))
+
+    page_stats['page_seconds'] = page_seconds
+    page_stats['pages'] = 1
+    with stats_lock:
+        for key, value in page_stats.items():
+            stats[key] = stats.get(key, 0) + value
+
+    final_ollama_text = ollama_final if use_two_step and ollama_final is not None else ollama_initial
+
+    # Saving Individual Files
+    tesseract_output_file = os.path.join(output_folder, f"{base_name}_tesseract.txt")
+    with open(tesseract_output_file, 'w', encoding='utf-8') as tes_file:
+        tes_file.write(tesseract_text)
+
+    # If in two-step mode, save the intermediate AI response
+    if use_two_step:
+        intermediate_output_file = os.path.join(output_folder, f"{base_name}_ollama_intermediate.txt")
+        with open(intermediate_output_file, 'w', encoding='utf-8') as inter_file:
+            inter_file.write(ollama_initial or "")
+
+    with open(final_ollama_output_path, 'w', encoding='utf-8') as ollama_file:
+        ollama_file.write(final_ollama_text or "")
+
+    return page_seconds
+
+def aggregate_results(output_folder, page_files, show_progress=True):
+    """Re-read all individual files to create a complete aggregation."""
     all_ollama_content = []
     all_tesseract_content = []
 
-    # Re-read all individual files to create a complete aggregation.
-    for image_file in tqdm(image_files, desc="Aggregating files"):
-        base_name = os.path.splitext(image_file)[0]
-        header = f"--- {image_file} ---\n"
+    for page_file in tqdm(page_files, desc="Aggregating files", disable=not show_progress):
+        base_name = os.path.splitext(page_file)[0]
+        header = f"--- {page_file} ---\n"
         
         ollama_file_path = os.path.join(output_folder, f"{base_name}_ollama.txt")
         if os.path.exists(ollama_file_path):
@@ -166,9 +322,259 @@ def main(folder_path, output_folder, use_two_step):
     with open(os.path.join(output_folder, "all_ollama_results.txt"), 'w', encoding='utf-8') as agg_file:
         agg_file.write('\n'.join(all_ollama_content))
 
-    with open(os.path.join(output_folder, "all_tesseract_results.txt"), 'w', encoding='uf-8') as agg_file:
+    with open(os.path.join(output_folder, "all_tesseract_results.txt"), 'w', encoding='utf-8') as agg_file:
         agg_file.write('\n'.join(all_tesseract_content))
-    
+
+def save_text_layer_page(output_folder, page_file, text):
+    """Save the embedded text of a born-digital PDF page as its final output, without OCR."""
+    base_name = os.path.splitext(page_file)[0]
+    with open(os.path.join(output_folder, f"{base_name}_pdftext.txt"), 'w', encoding='utf-8') as text_file:
+        text_file.write(text)
+    with open(os.path.join(output_folder, f"{base_name}_ollama.txt"), 'w', encoding='utf-8') as ollama_file:
+        ollama_file.write(text)
+
+def process_input(input_path, output_folder, split, pdf_options, ocr_page, use_text_layer=True):
+    """
+    OCR every page of one input file that has not been processed yet.
+
+    PDF pages with a text layer are saved directly; the others are rendered in a process
+    pool and OCR'd as they arrive.
+
+    Args:
+        input_path (str): Path of an image or PDF.
+        split (bool): Split every page into halves in memory.
+        pdf_options (dict): Keyword arguments for render_pdf_pages (dpi, grayscale, workers).
+        ocr_page (callable): ``ocr_page(image, page_file, input_path)`` OCRs one page, or queues it for OCR;
+            returns False if the page was skipped (already queued).
+        use_text_layer (bool): Save PDF text layers instead of OCR'ing those pages. Scanned PDFs
+            often carry a poor hidden OCR layer; pass False to OCR every page.
+
+    Returns:
+        tuple: (page_files, processed_pages, saved_pages), where page_files lists every page
+        of the input (processed now or before) in reading order, processed_pages counts the
+        pages queued for OCR and saved_pages the PDF text-layer pages saved without OCR.
+    """
+    input_file = os.path.basename(input_path)
+    processed_pages = 0
+
+    if not input_file.lower().endswith('.pdf'):
+        pages = page_names(input_file, split)
+        # Resume Capability
+        if all(is_processed(output_folder, page_file) for page_file in pages):
+            tqdm.write(f"Skipping '{input_file}' as it has already been processed.")
+            return pages, processed_pages, 0
+        for page_file, image in zip(pages, load_pages(input_path, split)):
+            if not is_processed(output_folder, page_file):
+                if ocr_page(image, page_file, input_path):
+                    processed_pages += 1
+        return pages, processed_pages, 0
+
+    page_files = []
+    to_render = []
+    text_pages = 0
+    for page_number, text in enumerate(read_text_layer(input_path)):
+        page_file = pdf_page_file(input_file, page_number)
+        if use_text_layer and has_text_layer(text):
+            page_files.append(page_file)
+            if not is_processed(output_folder, page_file):
+                save_text_layer_page(output_folder, page_file, text)
+                text_pages += 1
+        else:
+            pages = page_names(page_file, split)
+            page_files.extend(pages)
+            if not all(is_processed(output_folder, part_file) for part_file in pages):
+                to_render.append(page_number)
+    if text_pages:
+        tqdm.write(f"'{input_file}': took the text layer of {text_pages} page(s) without OCR.")
+
+    for page_number, image in render_pdf_pages(input_path, to_render, **pdf_options):
+        pages = page_names(pdf_page_file(input_file, page_number), split)
+        for page_file, page_image in zip(pages, load_pages(image, split)):
+            if not is_processed(output_folder, page_file):
+                if ocr_page(page_image, page_file, input_path):
+                    processed_pages += 1
+    return page_files, processed_pages, text_pages
+
+def report_timings(warm_up_seconds, stats):
+    """Print model load time separately from page latency."""
+    processed_pages = stats.get('pages', 0)
+    if processed_pages:
+        tqdm.write(f"\nModel load: {warm_up_seconds:.1f} s at warm-up, {stats.get('load_seconds', 0.0):.1f} s "
+                   f"in {stats.get('reloads', 0)} mid-run reload(s). Page latency: {stats['page_seconds'] / processed_pages:.1f} s/page "
+                   f"over {processed_pages} page(s), excluding load time.")
+
+class PagePool:
+    """
+    Runs process_page on worker threads, with at most ``2 * workers`` pages queued so
+    lazily rendered PDF pages are not all held in memory at once.
+
+    With ``keep_going``, a page that fails is logged and skipped instead of re-raising
+    its error (watch mode must not stop on one bad scan).
+    """
+
+    def __init__(self, workers, keep_going=False):
+        self.workers = workers
+        self.keep_going = keep_going
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = {}
+
+    def submit(self, image, page_file, *args):
+        while len(self.pending) >= 2 * self.workers:
+            self.collect(block=True)
+        self.pending[self.executor.submit(process_page, image, page_file, *args)] = page_file
+
+    def is_pending(self, page_file):
+        """Whether the page is queued or being processed."""
+        return page_file in self.pending.values()
+
+    def collect(self, block=False):
+        """Wait for finished pages (for at least one if ``block``); returns how many finished."""
+        done, _ = wait(self.pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            page_file = self.pending.pop(future)
+            try:
+                future.result()  # Re-raise errors from the worker thread
+            except Exception as e:
+                if not self.keep_going:
+                    raise
+                tqdm.write(f"Error processing '{page_file}', skipped: {e}")
+        return len(done)
+
+    def join(self):
+        """Wait for all queued pages and stop the workers."""
+        while self.pending:
+            self.collect(block=True)
+        self.executor.shutdown()
+
+def start_request_controller(max_in_flight, output_folder):
+    """Install an AIMD controller on the request layer when more than one request may be in flight."""
+    global request_controller
+    if max_in_flight > 1:
+        request_controller = AimdController(max_in_flight, log_path=os.path.join(output_folder, "concurrency_log.csv"))
+    return request_controller
+
+def stop_request_controller():
+    global request_controller
+    if request_controller is not None:
+        tqdm.write(f"Final in-flight limit: {request_controller.limit} (throughput curve in concurrency_log.csv).")
+        request_controller.close()
+        request_controller = None
+
+def main(folder_path, output_folder, use_two_step, refine='model', max_unresolved=0.15,
+         num_ctx=DEFAULT_NUM_CTX, keep_alive=DEFAULT_KEEP_ALIVE, split=False, pdf_options=None, max_in_flight=1,
+         preprocessor=None, use_text_layer=True):
+    """Main function to process all images and PDFs in a folder with resume capability."""
+    os.makedirs(output_folder, exist_ok=True)
+
+    input_files = sorted([f for f in os.listdir(folder_path) if f.lower().endswith(INPUT_EXTENSIONS)])
+
+    stats = {}
+    warm_up_seconds = None
+    start_request_controller(max_in_flight, output_folder)
+    pool = PagePool(max_in_flight)
+
+    def ocr_page(image, page_file, source):
+        nonlocal warm_up_seconds
+        # Load the model before the first page that needs it, so that page is not charged the load time (and does not time out).
+        if warm_up_seconds is None:
+            warm_up_seconds = warm_up_ollama(OLLAMA_MODEL, num_ctx, keep_alive)
+        # Cleaning starts now, so it overlaps the OCR of the pages queued before this one.
+        cleaning = preprocessor.submit(image, page_file, source) if preprocessor is not None else None
+        pool.submit(image, page_file, output_folder, use_two_step, refine, max_unresolved, num_ctx, keep_alive, stats,
+                    cleaning, preprocessor is not None and preprocessor.for_model)
+        return True
+
+    all_page_files = []
+    try:
+        for input_file in tqdm(input_files, desc="Processing images"):
+            page_files, _, _ = process_input(os.path.join(folder_path, input_file), output_folder, split,
+                                             pdf_options or {}, ocr_page, use_text_layer)
+            all_page_files.extend(page_files)
+        pool.join()
+    finally:
+        stop_request_controller()
+        
+    report_timings(warm_up_seconds or 0.0, stats)
+
+    # Aggregation Step
+    tqdm.write("\nJob complete. Aggregating all results...")
+    aggregate_results(output_folder, all_page_files)
+    tqdm.write("Aggregation complete. All files are up-to-date.")
+
+def watch(folder_path, output_folder, use_two_step, refine='model', max_unresolved=0.15,
+          num_ctx=DEFAULT_NUM_CTX, keep_alive=DEFAULT_KEEP_ALIVE, split=False, use_inotify=True, pdf_options=None,
+          max_in_flight=1, preprocessor=None, use_text_layer=True):
+    """
+    Daemon mode: OCR scans as they appear in the input folder until interrupted with Ctrl+C.
+
+    A watcher thread queues every fully written image or PDF while the main thread runs
+    the OCR pipeline, so scanning and OCR overlap. The aggregate files are rewritten
+    whenever pages finish, so they always cover everything processed so far.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    stats = {}
+    warm_up_seconds = warm_up_ollama(OLLAMA_MODEL, num_ctx, keep_alive)
+    start_request_controller(max_in_flight, output_folder)
+    pool = PagePool(max_in_flight, keep_going=True)
+
+    def ocr_page(image, page_file, source):
+        # The watcher can report a file twice (listed at startup and closed again, or reopened
+        # by the scanner); a page still queued or running must not be OCR'd a second time.
+        if pool.is_pending(page_file):
+            return False
+        cleaning = preprocessor.submit(image, page_file, source) if preprocessor is not None else None
+        pool.submit(image, page_file, output_folder, use_two_step, refine, max_unresolved, num_ctx, keep_alive, stats,
+                    cleaning, preprocessor is not None and preprocessor.for_model)
+        return True
+
+    image_queue = queue.Queue()
+    stop_event = threading.Event()
+
+    def queue_new_scans():
+        for image_path in watch_images(folder_path, INPUT_EXTENSIONS, use_inotify=use_inotify, stop_event=stop_event):
+            image_queue.put(image_path)
+
+    threading.Thread(target=queue_new_scans, daemon=True).start()
+    tqdm.write(f"Watching '{folder_path}' for new scans. Press Ctrl+C to stop.")
+
+    page_files = []
+    known_pages = set()
+    try:
+        while True:
+            try:
+                image_path = image_queue.get(timeout=1)
+            except queue.Empty:
+                image_path = None
+
+            outputs_changed = False
+            if image_path is not None:
+                # A corrupt file, or one moved away before it was read, must not stop the daemon.
+                try:
+                    input_pages, new_pages, saved_pages = process_input(image_path, output_folder, split,
+                                                                        pdf_options or {}, ocr_page, use_text_layer)
+                except Exception as e:
+                    tqdm.write(f"Error processing '{os.path.basename(image_path)}', skipped: {e}")
+                else:
+                    added_pages = [page_file for page_file in input_pages if page_file not in known_pages]
+                    page_files.extend(added_pages)
+                    known_pages.update(added_pages)
+                    # Text-layer pages are final as soon as they are saved, so they go into the aggregates now.
+                    outputs_changed = bool(added_pages or saved_pages)
+                    if new_pages:
+                        tqdm.write(f"'{os.path.basename(image_path)}': {new_pages} page(s) queued "
+                                   f"({image_queue.qsize()} scan(s) waiting).")
+
+            if pool.collect() or outputs_changed:
+                aggregate_results(output_folder, sorted(page_files), show_progress=False)
+    except KeyboardInterrupt:
+        stop_event.set()
+        tqdm.write("\nStopping watch mode, finishing queued pages...")
+        pool.join()
+    finally:
+        stop_request_controller()
+
+    report_timings(warm_up_seconds, stats)
+    aggregate_results(output_folder, sorted(page_files), show_progress=False)
     tqdm.write("Aggregation complete. All files are up-to-date.")
 
 if __name__ == "__main__":
@@ -176,6 +582,38 @@ if __name__ == "__main__":
     parser.add_argument('-i', '--input', required=True, help='Path to the folder containing images.')
     parser.add_argument('-o', '--output', required=True, help='Path to the folder where text files will be saved.')
     parser.add_argument('--two-step', action='store_true', help='Enable two-step AI refinement using Tesseract output. This will also save the intermediate AI response.')
+    parser.add_argument('--refine', choices=['model', 'consensus'], default='model', help="How the two-step refinement is done: a second model call, or a local consensus merge with Tesseract word confidences.")
+    parser.add_argument('--max-unresolved', type=float, default=0.15, help='With --refine consensus, fall back to model refinement when more than this fraction of tokens is unresolved.')
+    parser.add_argument('--num-ctx', type=int, default=DEFAULT_NUM_CTX, help='Context size for every request of the run. Changing it between requests makes Ollama reload the model.')
+    parser.add_argument('--keep-alive', default=DEFAULT_KEEP_ALIVE, help='How long Ollama keeps the model loaded after the last request (e.g. "30m" or "24h").')
+
+    parser.add_argument('--split', action='store_true', help='Split each scan into two halves in memory (as split_images.py does) before OCR.')
+    parser.add_argument('--watch', action='store_true', help='Keep running and OCR new scans as they are written to the input folder.')
+    parser.add_argument('--poll', action='store_true', help='In watch mode, poll the folder instead of using inotify (e.g. for network shares).')
+    parser.add_argument('--pdf-dpi', type=int, default=300, help='Resolution at which scanned PDF pages are rendered for OCR.')
+    parser.add_argument('--pdf-color', action='store_true', help='Render PDF pages in colour instead of grayscale.')
+    parser.add_argument('--pdf-workers', type=int, default=None, help='Processes used to render PDF pages (default: number of CPUs).')
+    parser.add_argument('--pdf-ocr-all', action='store_true', help='OCR every PDF page, ignoring embedded text layers (e.g. poor hidden OCR layers of scanned PDFs).')
+    parser.add_argument('--preprocess', action='store_true', help='Deskew, binarise and despeckle pages before Tesseract.')
+    parser.add_argument('--preprocess-model-image', action='store_true', help='With --preprocess, also send the cleaned page to the model.')
+    parser.add_argument('--preprocess-cache', help='With --preprocess, keep cleaned pages in this folder and reuse them on later runs.')
+    parser.add_argument('--preprocess-workers', type=int, default=None, help='Processes used for preprocessing (default: number of CPUs).')
+    add_preprocess_arguments(parser, prefix='preprocess-')
+    parser.add_argument('--max-in-flight', type=int, default=1, help='Upper bound on concurrent pages. Above 1, the number of in-flight model requests is tuned automatically from observed throughput and latency.')
 
     args = parser.parse_args()
-    main(args.input, args.output, args.two_step)
\ No newline at end of file
+    pdf_options = {'dpi': args.pdf_dpi, 'grayscale': not args.pdf_color, 'workers': args.pdf_workers}
+    preprocessor = None
+    if args.preprocess:
+        preprocessor = Preprocessor(preprocess_options_from_args(args, prefix='preprocess-'), args.preprocess_workers,
+                                    args.preprocess_cache, args.preprocess_model_image)
+    try:
+        if args.watch:
+            watch(args.input, args.output, args.two_step, args.refine, args.max_unresolved, args.num_ctx, args.keep_alive,
+                  args.split, not args.poll, pdf_options, args.max_in_flight, preprocessor, not args.pdf_ocr_all)
+        else:
+            main(args.input, args.output, args.two_step, args.refine, args.max_unresolved, args.num_ctx, args.keep_alive,
+                 args.split, pdf_options, args.max_in_flight, preprocessor, not args.pdf_ocr_all)
+    finally:
+        if preprocessor is not None:
+            preprocessor.close()
\ No newline at end of file
@@ -1,25 +1,49 @@
+import io
 import os
 import base64
 from PIL import Image
 import pytesseract
 import requests
 import argparse
+import json
 from tqdm import tqdm
+import time
+
+from llm_server import LMSTUDIO_URL, warm_up_lmstudio, PAGE_NUM_PREDICT
+from pdf_pages import read_text_layer, has_text_layer, render_pdf_pages, pdf_page_file
+from preprocess_image import Preprocessor, add_arguments as add_preprocess_arguments, options_from_args as preprocess_options_from_args
+
+LMSTUDIO_MODEL = "gemma-3-27b-it-k-latest"
+DEFAULT_TTL = 1800  # Seconds LM Studio keeps the model loaded after the last request
+INPUT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.pdf')
+
+def record_lmstudio_usage(stats, payload, result):
+    """Accumulate request size and token usage of one LMStudio call into ``stats``"""
+    usage = result.get('usage', {})
+    stats['requests'] = stats.get('requests', 0) + 1
+    stats['request_bytes'] = stats.get('request_bytes', 0) + len(json.dumps(payload).encode('utf-8'))
+    stats['prompt_tokens'] = stats.get('prompt_tokens', 0) + usage.get('prompt_tokens', 0)
+    stats['completion_tokens'] = stats.get('completion_tokens', 0) + usage.get('completion_tokens', 0)
 
 def process_image_with_tesseract(image_path):
-    # Load the image
-    image = Image.open(image_path)
+    # Load the image (or use an in-memory page, e.g. a rendered PDF page)
+    image = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
     # Perform OCR using Tesseract
     text = pytesseract.image_to_string(image, 'fas2')
     return text
 
 def encode_image(image_path):
-    """Encode image to base64 string"""
+    """Encode image (a path or an in-memory PIL image) to base64 string"""
+    if isinstance(image_path, Image.Image):
+        buffer = io.BytesIO()
+        image_path.convert('RGB').save(buffer, format='JPEG', quality=95)
+        return base64.b64encode(buffer.getvalue()).decode('utf-8')
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-def process_image_with_lmstudio(image_path, tesseract_text):
-    """Process image using LMStudio OpenAI-compatible API with LLaVA model"""
+def process_image_with_lmstudio(image_path, tesseract_text, ttl=DEFAULT_TTL, stats=None):
+    """Process image using LMStudio OpenAI-compatible API with LLaVA model.
+    Request sizes and token usage are added to ``stats`` when a dict is given."""
     # Encode the image to base64
     encoded_image = encode_image(image_path)
 
@@ -27,7 +51,7 @@ def process_image_with_lmstudio(image_path, tesseract_text):
 
     # Prepare the initial request payload for OpenAI-compatible API
     payload = {
-        "model": "gemma-3-27b-it-k-latest",
+        "model": LMSTUDIO_MODEL,
         "messages": [
             {
                 "role": "user",
@@ -45,21 +69,25 @@ def process_image_with_lmstudio(image_path, tesseract_text):
                 ]
             }
         ],
+        "max_tokens": PAGE_NUM_PREDICT,
+        "ttl": ttl,
         "stream": False
     }
 
     try:
         # Send initial request to LMStudio API (OpenAI-compatible endpoint)
-        response = requests.post('http://localhost:1234/v1/chat/completions', json=payload)
+        response = requests.post(f'{LMSTUDIO_URL}/v1/chat/completions', json=payload)
         response.raise_for_status()
 
         # Extract the initial response text from JSON
-        result = response.json()@
+        result = response.json()
         initial_response = result['choices'][0]['message']['content']
+        if stats is not None:
+            record_lmstudio_usage(stats, payload, result)
 
         # Prepare follow-up message to refine results with Tesseract comparison
         follow_up_payload = {
-            "model": "gemma-3-27b-it-k-latest",
+            "model": LMSTUDIO_MODEL,
             "messages": [
                 *payload["messages"],  # Include previous messages
                 {
@@ -76,15 +104,19 @@ def process_image_with_lmstudio(image_path, tesseract_text):
                     ]
                 }
             ],
+            "max_tokens": PAGE_NUM_PREDICT,
+            "ttl": ttl,
             "stream": False
         }
 
         # Send follow-up request to LMStudio API
-        follow_up_response = requests.post('http://localhost:1234/v1/chat/completions', json=follow_up_payload)
+        follow_up_response = requests.post(f'{LMSTUDIO_URL}/v1/chat/completions', json=follow_up_payload)
         follow_up_response.raise_for_status()
 
         # Extract the refined response text from JSON
         follow_up_result = follow_up_response.json()
+        if stats is not None:
+            record_lmstudio_usage(stats, follow_up_payload, follow_up_result)
         return follow_up_result['choices'][0]['message']['content']
 
     except requests.exceptions.RequestException as e:
@@ -92,31 +124,101 @@ def process_image_with_lmstudio(image_path, tesseract_text):
     except KeyError as e:
         return f"Error parsing LMStudio response: {str(e)}"
 
-def main(folder_path, output_folder):
+def input_pages(input_path, pdf_options, use_text_layer=True):
+    """
+    Yield the pages of an input file in reading order as ``(page_file, image, text_layer)``.
+
+    An image file is a single page. PDF pages with a text layer come with their text and
+    no image; the others are rendered in a process pool as they are needed.
+    """
+    input_file = os.path.basename(input_path)
+    if not input_file.lower().endswith('.pdf'):
+        yield input_file, input_path, None
+        return
+
+    texts = read_text_layer(input_path)
+    uses_text = [use_text_layer and has_text_layer(text) for text in texts]
+    rendered = render_pdf_pages(input_path, [n for n, use_text in enumerate(uses_text) if not use_text], **pdf_options)
+    for page_number, text in enumerate(texts):
+        if uses_text[page_number]:
+            yield pdf_page_file(input_file, page_number), None, text
+        else:
+            _, image = next(rendered)
+            yield pdf_page_file(input_file, page_number), image, None
+
+def clean_ahead(pages, preprocessor):
+    """
+    Start cleaning each page one page before it is OCR'd, so cleaning overlaps the model calls of the previous page.
+
+    Takes and yields ``(page_file, image, text_layer, source)`` tuples; ``source`` is replaced
+    by the future of the cleaned image (None for text-layer pages or without a preprocessor).
+    """
+    pending = None
+    for page_file, image, text_layer, source in pages:
+        cleaning = preprocessor.submit(image, page_file, source) if preprocessor is not None and image is not None else None
+        if pending is not None:
+            yield pending
+        pending = (page_file, image, text_layer, cleaning)
+    if pending is not None:
+        yield pending
+
+def main(folder_path, output_folder, ttl=DEFAULT_TTL, pdf_options=None, use_text_layer=True, preprocessor=None):
     # Create output folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
 
-    # List all image files in the folder
-    image_files = [f for f in os.listdir(folder_path) if f.endswith(('.png', '.jpg', '.jpeg'))]
+    # List all image and PDF files in the folder
+    input_files = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(INPUT_EXTENSIONS))
 
     # Collect all results for aggregation
     all_tesseract_results = []
     all_lmstudio_results = []
 
-    # Process files with progress bar
-    for image_file in tqdm(image_files, desc="Processing images"):
-        image_path = os.path.join(folder_path, image_file)
+    load_seconds = None
+    page_seconds = 0.0
+    processed_pages = 0
+
+    def all_pages():
+        # Process files with progress bar
+        for input_file in tqdm(input_files, desc="Processing images"):
+            input_path = os.path.join(folder_path, input_file)
+            for page_file, image, text_layer in input_pages(input_path, pdf_options or {}, use_text_layer):
+                yield page_file, image, text_layer, input_path
+
+    for page_file, image, text_layer, cleaning in clean_ahead(all_pages(), preprocessor):
+        base_name = os.path.splitext(page_file)[0]
+        lmstudio_output_file = os.path.join(output_folder, f"{base_name}_lmstudio.txt")
+
+        if text_layer is not None:
+            # Born-digital PDF page: its embedded text is the result, no OCR needed
+            with open(os.path.join(output_folder, f"{base_name}_pdftext.txt"), 'w', encoding='utf-8') as text_file:
+                text_file.write(text_layer)
+            with open(lmstudio_output_file, 'w', encoding='utf-8') as lmstudio_file:
+                lmstudio_file.write(text_layer)
+            all_lmstudio_results.append(f"--- {page_file} ---\n{text_layer}\n")
+            continue
+
+        # Load the model before the first page that needs it, so its latency is not charged the load time
+        if load_seconds is None:
+            load_seconds = warm_up_lmstudio(LMSTUDIO_MODEL, ttl)
+        page_start = time.perf_counter()
+
+        # Optionally use the cleaned page for Tesseract (and the model)
+        tesseract_image = model_image = image
+        if cleaning is not None:
+            tesseract_image = cleaning.result()
+            if preprocessor.for_model:
+                model_image = tesseract_image
 
         # Process with Tesseract
-        tesseract_text = process_image_with_tesseract(image_path)
+        tesseract_text = process_image_with_tesseract(tesseract_image)
 
         # Process with LMStudio
-        lmstudio_text = process_image_with_lmstudio(image_path, tesseract_text)
+        lmstudio_text = process_image_with_lmstudio(model_image, tesseract_text, ttl)
+        page_seconds += time.perf_counter() - page_start
+        processed_pages += 1
 
-        # Generate output file names (same as image name but .txt extension)
-        base_name = os.path.splitext(image_file)[0]
+        # Generate output file names (same as page name but .txt extension)
         tesseract_output_file = os.path.join(output_folder, f"{base_name}_tesseract.txt")
-        lmstudio_output_file = os.path.join(output_folder, f"{base_name}_lmstudio.txt")
 
         # Save results to individual text files
         with open(tesseract_output_file, 'w') as tes_file:
@@ -126,8 +228,11 @@ def main(folder_path, output_folder):
             lmstudio_file.write(lmstudio_text)
 
         # Collect results for aggregation
-        all_tesseract_results.append(f"--- {image_file} ---\n{tesseract_text}\n")
-        all_lmstudio_results.append(f"--- {image_file} ---\n{lmstudio_text}\n")
+        all_tesseract_results.append(f"--- {page_file} ---\n{tesseract_text}\n")
+        all_lmstudio_results.append(f"--- {page_file} ---\n{lmstudio_text}\n")
+
+    if processed_pages:
+        print(f"Model load: {load_seconds:.1f} s. Page latency: {page_seconds / processed_pages:.1f} s/page over {processed_pages} page(s).")
 
     # Save aggregated results
     with open(os.path.join(output_folder, "all_tesseract_results.txt"), 'w') as agg_file:
@@ -140,7 +245,26 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process images and save OCR results')
     parser.add_argument('-i', '--input', required=True, help='Path to the folder containing images')
     parser.add_argument('-o', '--output', required=True, help='Output folder path for text files')
+    parser.add_argument('--ttl', type=int, default=DEFAULT_TTL, help='Seconds LM Studio keeps the model loaded after the last request')
+    parser.add_argument('--pdf-dpi', type=int, default=300, help='Resolution at which scanned PDF pages are rendered for OCR')
+    parser.add_argument('--pdf-color', action='store_true', help='Render PDF pages in colour instead of grayscale')
+    parser.add_argument('--pdf-workers', type=int, default=None, help='Processes used to render PDF pages (default: number of CPUs)')
+    parser.add_argument('--pdf-ocr-all', action='store_true', help='OCR every PDF page, ignoring embedded text layers')
+    parser.add_argument('--preprocess', action='store_true', help='Deskew, binarise and despeckle pages before Tesseract')
+    parser.add_argument('--preprocess-model-image', action='store_true', help='With --preprocess, also send the cleaned page to the model')
+    parser.add_argument('--preprocess-cache', help='With --preprocess, keep cleaned pages in this folder and reuse them on later runs')
+    parser.add_argument('--preprocess-workers', type=int, default=None, help='Processes used for preprocessing (default: number of CPUs)')
+    add_preprocess_arguments(parser, prefix='preprocess-')
 
     args = parser.parse_args()
 
-    main(args.input, args.output)
+    pdf_options = {'dpi': args.pdf_dpi, 'grayscale': not args.pdf_color, 'workers': args.pdf_workers}
+    preprocessor = None
+    if args.preprocess:
+        preprocessor = Preprocessor(preprocess_options_from_args(args, prefix='preprocess-'), args.preprocess_workers,
+                                    args.preprocess_cache, args.preprocess_model_image)
+    try:
+        main(args.input, args.output, args.ttl, pdf_options, not args.pdf_ocr_all, preprocessor)
+    finally:
+        if preprocessor is not None:
+            preprocessor.close()
@@ -5,6 +5,14 @@ import pytesseract
 import requests
 import argparse
 from tqdm import tqdm
+import time
+
+from llm_server import LMSTUDIO_URL, warm_up_lmstudio, PAGE_NUM_PREDICT
+from consensus_merge import tesseract_words, merge_ocr, unresolved_ratio, format_unresolved
+
+LMSTUDIO_MODEL = "gemma-3-27b-it-k-latest"
+DEFAULT_TTL = 1800  # Seconds LM Studio keeps the model loaded after the last request
+
 def read_initial_response_from_file(image_path):
     """Read initial LMStudio response from corresponding text file"""
     base_name = os.path.splitext(os.path.basename(image_path))[0]
@@ -37,7 +45,7 @@ def encode_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-def process_image_with_lmstudio(image_path, tesseract_text, initial_response):
+def process_image_with_lmstudio(image_path, tesseract_text, initial_response, ttl=DEFAULT_TTL):
     """Process image using LMStudio OpenAI-compatible API with LLaVA model.
     If initial responses are available in files, use them instead of making live API calls."""
 
@@ -51,7 +59,7 @@ def process_image_with_lmstudio(image_path, tesseract_text, initial_response):
 
         # Prepare the initial request payload for OpenAI-compatible API
         payload = {
-            "model": "gemma-3-27b-it-k-latest",
+            "model": LMSTUDIO_MODEL,
             "messages": [
                 {
                     "role": "user",
@@ -69,12 +77,14 @@ def process_image_with_lmstudio(image_path, tesseract_text, initial_response):
                     ]
                 }
             ],
+            "max_tokens": PAGE_NUM_PREDICT,
+            "ttl": ttl,
             "stream": False
         }
 
         try:
             # Send initial request to LMStudio API (OpenAI-compatible endpoint)
-            response = requests.post('http://localhost:1234/v1/chat/completions', json=payload)
+            response = requests.post(f'{LMSTUDIO_URL}/v1/chat/completions', json=payload)
             response.raise_for_status()
 
             # Extract the initial response text from JSON
@@ -89,7 +99,7 @@ def process_image_with_lmstudio(image_path, tesseract_text, initial_response):
     # Prepare follow-up message to refine results with Tesseract comparison
     encoded_image = encode_image(image_path)
     follow_up_payload = {
-        "model": "gemma-3-27b-it-k-latest",
+        "model": LMSTUDIO_MODEL,
         "messages": [
             {
                 "role": "user",
@@ -120,12 +130,14 @@ def process_image_with_lmstudio(image_path, tesseract_text, initial_response):
                 ]
             }
         ],
+        "max_tokens": PAGE_NUM_PREDICT,
+        "ttl": ttl,
         "stream": False
     }
 
     try:
         # Send follow-up request to LMStudio API
-        follow_up_response = requests.post('http://localhost:1234/v1/chat/completions', json=follow_up_payload)
+        follow_up_response = requests.post(f'{LMSTUDIO_URL}/v1/chat/completions', json=follow_up_payload)
         follow_up_response.raise_for_status()
 
         # Extract the refined response text from JSON
@@ -137,7 +149,30 @@ def process_image_with_lmstudio(image_path, tesseract_text, initial_response):
     except KeyError as e:
         return f"Error parsing LMStudio response: {str(e)}"
 
-def main(folder_path, output_folder):
+def refine_with_consensus(image_path, tesseract_text, lmstudio_text, flags_output_file, max_unresolved, ttl=DEFAULT_TTL):
+    """Merge saved LMStudio and Tesseract outputs locally; fall back to the model when too much stays unresolved."""
+    # Tesseract is re-run for word confidences. The saved text has none, and without them
+    # no disagreement can be decided, so a failed run skips the merge.
+    _, words = tesseract_words(image_path, 'fas2')
+    if not words:
+        print(f"No Tesseract word confidences for {image_path}, refining with LMStudio.")
+        if os.path.exists(flags_output_file):
+            os.remove(flags_output_file)
+        return process_image_with_lmstudio(image_path, tesseract_text, lmstudio_text, ttl)
+
+    merged, unresolved = merge_ocr(lmstudio_text, words)
+    if unresolved:
+        with open(flags_output_file, 'w', encoding='utf-8') as flags_file:
+            flags_file.write(format_unresolved(unresolved))
+    elif os.path.exists(flags_output_file):
+        os.remove(flags_output_file)
+
+    if unresolved_ratio(lmstudio_text, unresolved) > max_unresolved:
+        print(f"Too many unresolved spans in {image_path}, refining with LMStudio.")
+        return process_image_with_lmstudio(image_path, tesseract_text, lmstudio_text, ttl)
+    return merged
+
+def main(folder_path, output_folder, refine='model', max_unresolved=0.15, ttl=DEFAULT_TTL):
     # Create output folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
 
@@ -148,6 +183,11 @@ def main(folder_path, output_folder):
     all_tesseract_results = []
     all_lmstudio_results = []
 
+    # Load the model before the first page so its latency is not charged the load time
+    load_seconds = warm_up_lmstudio(LMSTUDIO_MODEL, ttl) if image_files and refine == 'model' else 0.0
+    page_seconds = 0.0
+    processed_pages = 0
+
     # Process files with progress bar
     for image_file in tqdm(image_files, desc="Processing images"):
         image_path = os.path.join(folder_path, image_file)
@@ -157,6 +197,7 @@ def main(folder_path, output_folder):
         tesseract_output_file = os.path.join(output_folder, f"{base_name}_tesseract.txt")
         lmstudio_output_file = os.path.join(output_folder, f"{base_name}_lmstudio.txt")
         lmstudio_new_output_file = os.path.join(output_folder, f"{base_name}_lmstudio_modified.txt")
+        flags_output_file = os.path.join(output_folder, f"{base_name}_consensus_flags.txt")
 
         # Check if we already have saved responses
         has_saved_responses = (
@@ -173,8 +214,14 @@ def main(folder_path, output_folder):
             with open(lmstudio_output_file, 'r') as lmstudio_file:
                 lmstudio_text = lmstudio_file.read()
 
-            # Process with LMStudio (will use file-based responses if available)
-            lmstudio_text = process_image_with_lmstudio(image_path, tesseract_text, lmstudio_text)
+            page_start = time.perf_counter()
+            if refine == 'consensus':
+                lmstudio_text = refine_with_consensus(image_path, tesseract_text, lmstudio_text, flags_output_file, max_unresolved, ttl)
+            else:
+                # Process with LMStudio (will use file-based responses if available)
+                lmstudio_text = process_image_with_lmstudio(image_path, tesseract_text, lmstudio_text, ttl)
+            page_seconds += time.perf_counter() - page_start
+            processed_pages += 1
 
 
             with open(lmstudio_new_output_file, 'w') as lmstudio_new_file:
@@ -184,6 +231,9 @@ def main(folder_path, output_folder):
             print("no saved responses for", image_file)
 
 
+    if processed_pages:
+        print(f"Model load: {load_seconds:.1f} s. Page latency: {page_seconds / processed_pages:.1f} s/page over {processed_pages} page(s).")
+
     with open(os.path.join(output_folder, "all_lmstudio_modified_results.txt"), 'w') as agg_file:
         agg_file.write('\n'.join(all_lmstudio_results))
 
@@ -191,7 +241,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process images and save OCR results')
     parser.add_argument('-i', '--input', required=True, help='Path to the folder containing images')
     parser.add_argument('-o', '--output', required=True, help='Output folder path for text files')
+    parser.add_argument('--refine', choices=['model', 'consensus'], default='model', help='Refine with a second LMStudio call, or merge locally using Tesseract word confidences')
+    parser.add_argument('--max-unresolved', type=float, default=0.15, help='With --refine consensus, fall back to LMStudio when more than this fraction of tokens is unresolved')
+
+    parser.add_argument('--ttl', type=int, default=DEFAULT_TTL, help='Seconds LM Studio keeps the model loaded after the last request')
 
     args = parser.parse_args()
 
-    main(args.input, args.output)
+    main(args.input, args.output, args.refine, args.max_unresolved, args.ttl)
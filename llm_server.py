@@ -0,0 +1,94 @@
+import time
+import requests
+from tqdm import tqdm
+
+OLLAMA_URL = 'http://localhost:11434'
+LMSTUDIO_URL = 'http://localhost:1234'
+
+# Output cap for one page. A dense Persian page needs about 1-2k tokens; the cap only stops
+# runaway generations. It is not sized from the Tesseract text, whose length says nothing
+# when Tesseract fails or returns garbage on a skewed scan.
+PAGE_NUM_PREDICT = 4096
+
+
+def warm_up_ollama(model, num_ctx, keep_alive, timeout=600):
+    """
+    Load the model on the Ollama server before the page loop.
+
+    The warm-up uses the same ``num_ctx`` as the page requests: Ollama reloads the model
+    whenever the context size changes, so it has to stay fixed for the whole run.
+
+    Args:
+        model (str): Model tag, e.g. ``gemma3:27b-it-q8_0``.
+        num_ctx (int): Context size used for every request of the run.
+        keep_alive (str): How long Ollama keeps the model loaded after the last request.
+        timeout (int): Timeout in seconds; loading a 27B model can take minutes from a cold disk.
+
+    Returns:
+        float: Seconds the server spent loading the model (0 if it was already loaded).
+    """
+    tags = requests.get(f"{OLLAMA_URL}/api/tags", timeout=30)
+    tags.raise_for_status()
+    available = [m['name'] for m in tags.json().get('models', [])]
+    if model not in available:
+        raise SystemExit(f"Model '{model}' is not available on the Ollama server. Pull it with 'ollama pull {model}'.")
+
+    start = time.perf_counter()
+    payload = {"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive, "options": {"num_ctx": num_ctx}}
+    response = requests.post(f"{OLLAMA_URL}/api/generate", json=payload, timeout=timeout)
+    response.raise_for_status()
+    load_seconds = response.json().get('load_duration', 0) / 1e9
+
+    running = requests.get(f"{OLLAMA_URL}/api/ps", timeout=30)
+    running.raise_for_status()
+    loaded = {m['name']: m for m in running.json().get('models', [])}
+    if model not in loaded:
+        raise SystemExit(f"Model '{model}' did not stay loaded after warm-up.")
+    if loaded[model].get('size_vram', 0) < loaded[model].get('size', 0):
+        tqdm.write(f"Warning: '{model}' is only partially offloaded to the GPU; pages will be slow.")
+
+    tqdm.write(f"Model '{model}' ready (load {load_seconds:.1f} s, warm-up {time.perf_counter() - start:.1f} s, num_ctx {num_ctx}).")
+    return load_seconds
+
+
+def warm_up_lmstudio(model, ttl, timeout=600):
+    """
+    Load the model on the LM Studio server before the page loop.
+
+    LM Studio does not report load time, so the wall time of a one-token request is used.
+
+    Args:
+        model (str): Model identifier, e.g. ``gemma-3-27b-it-k-latest``.
+        ttl (int): Seconds LM Studio keeps a just-in-time loaded model after the last request.
+        timeout (int): Timeout in seconds for the warm-up request.
+
+    Returns:
+        float: Wall time of the warm-up request in seconds.
+    """
+    try:
+        models = requests.get(f"{LMSTUDIO_URL}/api/v0/models", timeout=30)
+        models.raise_for_status()
+        states = {m['id']: m.get('state') for m in models.json().get('data', [])}
+    except requests.exceptions.RequestException:
+        # Older LM Studio versions only have the OpenAI-compatible listing, without load state.
+        models = requests.get(f"{LMSTUDIO_URL}/v1/models", timeout=30)
+        models.raise_for_status()
+        states = {m['id']: None for m in models.json().get('data', [])}
+    if model not in states:
+        raise SystemExit(f"Model '{model}' is not available on the LM Studio server.")
+
+    start = time.perf_counter()
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": "ok"}],
+        "max_tokens": 1,
+        "ttl": ttl,
+        "stream": False
+    }
+    response = requests.post(f"{LMSTUDIO_URL}/v1/chat/completions", json=payload, timeout=timeout)
+    response.raise_for_status()
+    load_seconds = time.perf_counter() - start
+
+    state = 'already loaded' if states[model] == 'loaded' else 'loaded'
+    tqdm.write(f"Model '{model}' {state} (warm-up {load_seconds:.1f} s).")
+    return load_seconds
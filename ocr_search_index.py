@@ -0,0 +1,254 @@
+import os
+import re
+import sqlite3
+import argparse
+import time
+from tqdm import tqdm
+
+from persian_text import normalize
+
+# Per-page output suffixes written by the processors, longest first so that
+# "x_ollama_intermediate.txt" is not mistaken for engine "intermediate" of page "x_ollama".
+ENGINES = ('ollama_intermediate', 'lmstudio_modified', 'tesseract', 'lmstudio', 'ollama', 'pdftext')
+
+_PAGE_FILE_RE = re.compile(r'^(?P<page>.+)_(?P<engine>' + '|'.join(ENGINES) + r')\.txt$')
+_AGGREGATE_FILE_RE = re.compile(r'^all_(?P<engine>' + '|'.join(ENGINES) + r')_results\.txt$')
+_AGGREGATE_HEADER_RE = re.compile(r'^--- (?P<image>.+) ---$', re.MULTILINE)
+_WORD_RE = re.compile(r'\w+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+    page, engine, source UNINDEXED, body, original UNINDEXED, tokenize = 'unicode61'
+);
+"""
+
+# Snippet length in words, on either side of the first matching word.
+SNIPPET_WORDS = 6
+
+
+def discover_sources(roots):
+    """
+    Find OCR output files below the given folders.
+
+    Per-page files (``<page>_<engine>.txt``) are preferred. An aggregate file
+    (``all_<engine>_results.txt``) is only used for an engine that has no per-page
+    files in the same folder, so older runs that only kept aggregates stay searchable.
+
+    Args:
+        roots (list): Folders (or individual files) to scan recursively.
+
+    Returns:
+        dict: Maps absolute file path to ``'page'`` or ``'aggregate'``.
+    """
+    sources = {}
+    for root in roots:
+        if os.path.isfile(root):
+            root_dir, names = os.path.dirname(root) or '.', [os.path.basename(root)]
+            walk = [(root_dir, names)]
+        else:
+            walk = ((dirpath, filenames) for dirpath, _, filenames in os.walk(root))
+
+        for dirpath, filenames in walk:
+            page_engines = set()
+            aggregates = []
+            for name in filenames:
+                aggregate = _AGGREGATE_FILE_RE.match(name)
+                if aggregate:
+                    aggregates.append((name, aggregate.group('engine')))
+                    continue
+                page = _PAGE_FILE_RE.match(name)
+                if page:
+                    page_engines.add(page.group('engine'))
+                    sources[os.path.abspath(os.path.join(dirpath, name))] = 'page'
+            for name, engine in aggregates:
+                if engine not in page_engines:
+                    sources[os.path.abspath(os.path.join(dirpath, name))] = 'aggregate'
+    return sources
+
+
+def read_source(path, kind):
+    """
+    Split an OCR output file into ``(page, engine, text)`` records.
+
+    Args:
+        path (str): Path to a per-page or aggregate output file.
+        kind (str): ``'page'`` or ``'aggregate'``, as returned by :func:`discover_sources`.
+
+    Returns:
+        list: One tuple per page found in the file.
+    """
+    name = os.path.basename(path)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        content = f.read()
+
+    if kind == 'page':
+        match = _PAGE_FILE_RE.match(name)
+        return [(match.group('page'), match.group('engine'), content)]
+
+    engine = _AGGREGATE_FILE_RE.match(name).group('engine')
+    headers = list(_AGGREGATE_HEADER_RE.finditer(content))
+    records = []
+    for index, header in enumerate(headers):
+        end = headers[index + 1].start() if index + 1 < len(headers) else len(content)
+        page = os.path.splitext(header.group('image'))[0]
+        records.append((page, engine, content[header.end():end].strip('\n')))
+    return records
+
+
+def connect(db_path):
+    """
+    Open (and create if needed) the search index database.
+
+    An index built before the original page text was stored is dropped, so the next
+    ``index`` run rebuilds it from scratch.
+    """
+    conn = sqlite3.connect(db_path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(pages)")]
+    if columns and 'original' not in columns:
+        print(f"Index '{db_path}' uses an older format; it will be rebuilt on the next 'index' run.")
+        conn.executescript("DROP TABLE pages; DROP TABLE IF EXISTS sources;")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def update_index(conn, roots):
+    """
+    Bring the index in line with the OCR outputs on disk.
+
+    Only files whose size or modification time changed since the last run are
+    re-read; files that disappeared are removed from the index.
+
+    Args:
+        conn (sqlite3.Connection): Connection returned by :func:`connect`.
+        roots (list): Folders (or files) to index.
+
+    Returns:
+        tuple: ``(updated, removed, unchanged)`` file counts.
+    """
+    sources = discover_sources(roots)
+    known = {path: (mtime_ns, size) for path, mtime_ns, size in conn.execute("SELECT path, mtime_ns, size FROM sources")}
+    abs_roots = [os.path.abspath(root) for root in roots]
+
+    updated = removed = unchanged = 0
+    with conn:
+        for path in list(known):
+            in_scope = any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in abs_roots)
+            if in_scope and path not in sources:
+                conn.execute("DELETE FROM pages WHERE source = ?", (path,))
+                conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+                removed += 1
+
+        for path, kind in tqdm(sorted(sources.items()), desc="Indexing files"):
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if known.get(path) == signature:
+                unchanged += 1
+                continue
+
+            conn.execute("DELETE FROM pages WHERE source = ?", (path,))
+            conn.executemany(
+                "INSERT INTO pages (page, engine, source, body, original) VALUES (?, ?, ?, ?, ?)",
+                [(page, engine, path, normalize(text), text) for page, engine, text in read_source(path, kind)]
+            )
+            conn.execute("INSERT OR REPLACE INTO sources (path, mtime_ns, size) VALUES (?, ?, ?)", (path, *signature))
+            updated += 1
+
+    return updated, removed, unchanged
+
+
+def build_match_query(query):
+    """Normalise a user query and quote each term so FTS5 operators in OCR text are matched literally."""
+    terms = normalize(query).split()
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def make_snippet(text, terms, words=SNIPPET_WORDS):
+    """
+    Cut a snippet around the first matching word of the original page text.
+
+    FTS5's own snippet() could only show the normalised body, so matching is redone here:
+    a word matches when one of its normalised tokens is a query term. Matches are wrapped
+    in ``[...]`` and the text itself is left as it is in the page file.
+
+    Args:
+        text (str): Original page text.
+        terms (set): Normalised query terms.
+        words (int): Words of context on either side of the first match.
+
+    Returns:
+        str: The snippet.
+    """
+    page_words = text.split()
+    hits = [any(token in terms for token in _WORD_RE.findall(normalize(word))) for word in page_words]
+    first = hits.index(True) if any(hits) else 0
+    start, end = max(0, first - words), min(len(page_words), first + words + 1)
+    snippet = ' '.join(f"[{word}]" if hit else word for word, hit in zip(page_words[start:end], hits[start:end]))
+    return ('...' if start > 0 else '') + snippet + ('...' if end < len(page_words) else '')
+
+
+def search(conn, query, engine=None, limit=20):
+    """
+    Search the index.
+
+    Args:
+        conn (sqlite3.Connection): Connection returned by :func:`connect`.
+        query (str): Words to look for; all of them must appear on the page.
+        engine (str): Restrict results to one engine (e.g. ``'tesseract'``).
+        limit (int): Maximum number of results.
+
+    Returns:
+        list: ``(page, engine, snippet)`` tuples, best match first.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    sql = ("SELECT page, engine, original FROM pages "
+           "WHERE pages MATCH ?")
+    params = [match]
+    if engine:
+        sql += " AND engine = ?"
+        params.append(engine)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    terms = set(_WORD_RE.findall(normalize(query)))
+    return [(page, engine, make_snippet(original, terms)) for page, engine, original in conn.execute(sql, params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-text search over OCR outputs with Persian text normalisation.')
+    parser.add_argument('-d', '--db', default='ocr_index.sqlite', help='Path to the SQLite index file.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser('index', help='Add new or changed OCR outputs to the index.')
+    index_parser.add_argument('folders', nargs='+', help='Output folders (or files) produced by the OCR processors.')
+
+    search_parser = subparsers.add_parser('search', help='Find pages containing all of the given words.')
+    search_parser.add_argument('query', nargs='+', help='Words to search for.')
+    search_parser.add_argument('-e', '--engine', choices=ENGINES, help='Only search outputs of this engine.')
+    search_parser.add_argument('-n', '--limit', type=int, default=20, help='Maximum number of results.')
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+
+    if args.command == 'index':
+        updated, removed, unchanged = update_index(conn, args.folders)
+        print(f"Indexed {updated} changed file(s), removed {removed}, {unchanged} unchanged.")
+    else:
+        start = time.perf_counter()
+        results = search(conn, ' '.join(args.query), args.engine, args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for page, engine, snippet in results:
+            print(f"{page} [{engine}]: {snippet.replace(chr(10), ' ')}")
+        print(f"\n{len(results)} result(s) in {elapsed_ms:.1f} ms")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
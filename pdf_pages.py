@@ -0,0 +1,100 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+from persian_text import fold_presentation_forms
+
+try:
+    import pymupdf
+except ImportError:  # Only needed when a PDF is actually given as input.
+    pymupdf = None
+
+# A page whose text layer has at least this many characters is taken as born-digital.
+MIN_TEXT_LAYER_CHARS = 50
+
+
+def _require_pymupdf():
+    if pymupdf is None:
+        raise SystemExit("PDF input needs PyMuPDF. Install it with 'pip install pymupdf'.")
+
+
+def read_text_layer(pdf_path):
+    """
+    Extract the embedded text of every page of a PDF.
+
+    Arabic Presentation Forms, which older PDFs often use for Persian, are folded to the
+    plain letters so the saved text is searchable.
+
+    Args:
+        pdf_path (str): Path to the PDF.
+
+    Returns:
+        list: One string per page; empty for scanned pages without a text layer.
+    """
+    _require_pymupdf()
+    with pymupdf.open(pdf_path) as doc:
+        return [fold_presentation_forms(page.get_text()) for page in doc]
+
+
+def has_text_layer(text):
+    """Whether extracted page text is substantial enough to skip OCR."""
+    return len(text.strip()) >= MIN_TEXT_LAYER_CHARS
+
+
+_worker_doc = None
+
+
+def _open_in_worker(pdf_path):
+    global _worker_doc
+    _worker_doc = pymupdf.open(pdf_path)
+
+
+def _render_page(page_number, dpi, grayscale):
+    colorspace = pymupdf.csGRAY if grayscale else pymupdf.csRGB
+    pix = _worker_doc[page_number].get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+    return ('L' if grayscale else 'RGB'), (pix.width, pix.height), pix.samples
+
+
+def render_pdf_pages(pdf_path, page_numbers, dpi=300, grayscale=True, workers=None):
+    """
+    Rasterise PDF pages in a process pool, yielding them in order as they are needed.
+
+    Only a small window of pages is rendered ahead of the consumer, so a long PDF does
+    not have to fit in memory and OCR of the first page starts as soon as it is ready.
+
+    Args:
+        pdf_path (str): Path to the PDF.
+        page_numbers (list): Zero-based page numbers to render.
+        dpi (int): Rendering resolution.
+        grayscale (bool): Render single-channel images instead of RGB.
+        workers (int): Number of rendering processes (defaults to the CPU count).
+
+    Yields:
+        tuple: ``(page_number, PIL.Image.Image)``; the image carries ``info['dpi']``.
+    """
+    _require_pymupdf()
+    if not page_numbers:
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_in_worker, initargs=(pdf_path,)) as executor:
+        remaining = iter(page_numbers)
+        in_flight = deque()
+        for page_number in remaining:
+            in_flight.append((page_number, executor.submit(_render_page, page_number, dpi, grayscale)))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            page_number, future = in_flight.popleft()
+            next_page = next(remaining, None)
+            if next_page is not None:
+                in_flight.append((next_page, executor.submit(_render_page, next_page, dpi, grayscale)))
+            mode, size, samples = future.result()
+            image = Image.frombytes(mode, size, samples)
+            image.info['dpi'] = (dpi, dpi)
+            yield page_number, image
+
+
+def pdf_page_file(pdf_file, page_number):
+    """Name a PDF page like the scanner names its images, e.g. ``book-00003.pdf``."""
+    return f"{os.path.splitext(pdf_file)[0]}-{page_number + 1:05d}.pdf"
@@ -0,0 +1,79 @@
+import re
+import unicodedata
+
+# Arabic code points that OCR engines and keyboards emit in place of their Persian equivalents.
+_LETTER_MAP = {
+    'ي': 'ی',  # Arabic yeh
+    'ى': 'ی',  # Alef maksura
+    'ئ': 'ی',  # Yeh with hamza above
+    'ك': 'ک',  # Arabic kaf
+    'ة': 'ه',  # Teh marbuta
+    'ۀ': 'ه',  # Heh with yeh above
+    'ؤ': 'و',  # Waw with hamza above
+    'أ': 'ا',  # Alef with hamza above
+    'إ': 'ا',  # Alef with hamza below
+    'ٱ': 'ا',  # Alef wasla
+}
+
+# Persian (U+06F0..) and Arabic-Indic (U+0660..) digits both map to ASCII digits.
+_DIGIT_MAP = {
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+}
+
+# Zero-width joiners/non-joiners, tatweel, bidi marks and harakat are dropped so that
+# "می‌شود", "میشود" and "مي‌شود" all collapse to the same form.
+_DROPPED = (
+    ['\u200c', '\u200d', '\u200e', '\u200f', '\u200b', '\ufeff', '\u0640']
+    + [chr(c) for c in range(0x064B, 0x0660)]  # Fathatan .. hamza below
+    + ['\u0670']  # Superscript alef
+)
+
+# Arabic Presentation Forms (contextual glyph shapes and ligatures) fold to the plain letters
+# under NFKC. Old PDF text layers often store Persian this way.
+_PRESENTATION_FORMS = {
+    ch: unicodedata.normalize('NFKC', ch)
+    for ch in map(chr, [*range(0xFB50, 0xFE00), *range(0xFE70, 0xFEFF)])
+    if unicodedata.normalize('NFKC', ch) != ch
+}
+PRESENTATION_FORMS_TABLE = str.maketrans(_PRESENTATION_FORMS)
+
+_CHARACTER_MAP = {
+    **_LETTER_MAP,
+    **_DIGIT_MAP,
+    **{ch: None for ch in _DROPPED},
+    '٫': '.',  # Arabic decimal separator
+    '٬': ',',  # Arabic thousands separator
+    '،': ',',  # Arabic comma
+    '؛': ';',  # Arabic semicolon
+    '؟': '?',  # Arabic question mark
+}
+_BASE_TABLE = str.maketrans(_CHARACTER_MAP)
+
+# translate() makes a single pass, so presentation forms map straight to their normalised letters.
+NORMALIZATION_TABLE = str.maketrans({
+    **{ch: folded.translate(_BASE_TABLE) for ch, folded in _PRESENTATION_FORMS.items()},
+    **_CHARACTER_MAP,
+})
+
+_WHITESPACE_RE = re.compile(r'[ \t\u00a0]+')
+
+
+def fold_presentation_forms(text):
+    """Replace Arabic Presentation Forms with the plain Arabic letters (NFKC), leaving all other text as it is."""
+    return text.translate(PRESENTATION_FORMS_TABLE)
+
+
+def normalize(text):
+    """
+    Normalise Persian text so that spelling variants produced by different OCR engines compare equal.
+
+    Args:
+        text (str): The text to normalise.
+
+    Returns:
+        str: The text with presentation forms folded, Arabic letters/digits mapped to their Persian/ASCII forms, zero-width
+        characters and diacritics removed, Latin letters lower-cased and runs of spaces collapsed.
+    """
+    text = text.translate(NORMALIZATION_TABLE).lower()
+    return _WHITESPACE_RE.sub(' ', text)
@@ -0,0 +1,288 @@
+import os
+import hashlib
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, Future
+from PIL import Image
+from tqdm import tqdm
+
+DEFAULT_OPTIONS = {
+    'target_dpi': 300,      # Resample to this resolution (0 disables)
+    'assumed_dpi': 300,     # Resolution of images without plausible DPI metadata (phone photos, split halves)
+    'max_pixels': 40_000_000,  # Resampling never produces a larger page (0 disables the cap)
+    'max_skew': 5.0,        # Largest skew angle searched, in degrees (0 disables deskew)
+    'skew_step': 0.2,       # Resolution of the skew search, in degrees
+    'window': 31,           # Sauvola window size in pixels at target_dpi (0 disables binarisation)
+    'k': 0.2,               # Sauvola sensitivity
+    'border': 0.05,         # Largest fraction of width/height cleared as scanner border (0 disables)
+    'despeckle': True,      # Remove isolated ink pixels
+}
+
+
+# DPI metadata outside this range is not a scanner setting: phone cameras write 72 dpi into
+# their EXIF data, which would otherwise blow a 12 MP photo up by a factor of four per axis.
+TRUSTED_DPI_RANGE = (150, 1200)
+
+
+def normalize_dpi(img, target_dpi, assumed_dpi, max_pixels=0):
+    """
+    Resample the image to ``target_dpi`` based on its DPI metadata.
+
+    Metadata outside TRUSTED_DPI_RANGE is ignored in favour of ``assumed_dpi``, and the
+    result is kept below ``max_pixels`` (0 disables the cap).
+    """
+    dpi = float(img.info.get('dpi', (0, 0))[0] or 0)
+    if not TRUSTED_DPI_RANGE[0] <= dpi <= TRUSTED_DPI_RANGE[1]:
+        dpi = assumed_dpi
+    if not target_dpi:
+        return img
+    scale = target_dpi / dpi
+    if max_pixels:
+        scale = min(scale, (max_pixels / float(img.width * img.height)) ** 0.5)
+    if abs(scale - 1) < 0.1:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.LANCZOS)
+
+
+def estimate_skew(gray, max_angle, step):
+    """
+    Estimate the skew of text lines by projection profiles.
+
+    Ink pixels of a downsampled copy are projected onto the vertical axis along lines of
+    each candidate slope; the slope that makes the row histogram sharpest (highest
+    variance) is the text-line direction. All candidates are evaluated with NumPy
+    bincounts, without rotating the image.
+
+    Returns:
+        float: Skew in degrees; rotating the image by this angle with PIL straightens it.
+    """
+    factor = max(1, gray.shape[1] // 800)
+    small = gray[::factor, ::factor]
+    ys, xs = np.nonzero(small < small.mean() - small.std())
+    if len(xs) < 100:
+        return 0.0
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rows = np.round(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+        profile = np.bincount(rows - rows.min())
+        score = profile.astype(np.float64).var()
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def _box_sum(values, window):
+    """Sum of ``values`` over a ``window`` x ``window`` box around every pixel, via an integral image."""
+    half = window // 2
+    padded = np.pad(values, ((half + 1, half), (half + 1, half)), mode='edge')
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    return (integral[window:, window:] - integral[:-window, window:]
+            - integral[window:, :-window] + integral[:-window, :-window])
+
+
+def sauvola_threshold(gray, window, k, dynamic_range=128.0):
+    """
+    Binarise with Sauvola's adaptive threshold ``mean * (1 + k * (std / R - 1))``.
+
+    Local mean and standard deviation come from integral images, so the cost does not
+    depend on the window size. Grey or uneven backgrounds (phone photos) end up white.
+
+    Returns:
+        numpy.ndarray: Boolean ink mask.
+    """
+    gray = gray.astype(np.float64)
+    area = float(window * window)
+    mean = _box_sum(gray, window) / area
+    variance = np.maximum(_box_sum(gray * gray, window) / area - mean * mean, 0)
+    threshold = mean * (1 + k * (np.sqrt(variance) / dynamic_range - 1))
+    return gray < threshold
+
+
+def clear_borders(ink, max_fraction):
+    """Clear dark scanner edges: outer rows/columns that are mostly ink, up to ``max_fraction`` of the page."""
+    height, width = ink.shape
+    for axis, size in ((0, height), (1, width)):
+        coverage = ink.mean(axis=1 - axis)
+        limit = int(size * max_fraction)
+        for edge in (range(limit), range(size - 1, size - 1 - limit, -1)):
+            for index in edge:
+                if coverage[index] < 0.5:
+                    break
+                if axis == 0:
+                    ink[index, :] = False
+                else:
+                    ink[:, index] = False
+    return ink
+
+
+def remove_speckles(ink):
+    """
+    Drop ink pixels that have no ink neighbour in their 3x3 box.
+
+    Only single-pixel specks are removed; Persian dots (nuqta) span several pixels at
+    300 DPI and survive.
+    """
+    neighbours = _box_sum(ink.astype(np.int32), 3) - ink
+    return ink & (neighbours > 0)
+
+
+def preprocess(img, options=None):
+    """
+    Clean a scan for OCR: DPI normalisation, deskew, Sauvola binarisation, border and speckle removal.
+
+    Args:
+        img (PIL.Image.Image): The page.
+        options (dict): Overrides for DEFAULT_OPTIONS.
+
+    Returns:
+        PIL.Image.Image: Grayscale page (black text on white when binarisation is enabled), tagged with its DPI.
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    img = normalize_dpi(img, options['target_dpi'], options['assumed_dpi'], options['max_pixels'])
+    gray_img = img.convert('L')
+
+    if options['max_skew']:
+        angle = estimate_skew(np.asarray(gray_img), options['max_skew'], options['skew_step'])
+        if abs(angle) >= options['skew_step']:
+            gray_img = gray_img.rotate(angle, resample=Image.BICUBIC, fillcolor=255)
+
+    if not options['window']:
+        gray_img.info['dpi'] = (options['target_dpi'] or options['assumed_dpi'],) * 2
+        return gray_img
+
+    ink = sauvola_threshold(np.asarray(gray_img), options['window'] | 1, options['k'])
+    if options['border']:
+        ink = clear_borders(ink, options['border'])
+    if options['despeckle']:
+        ink = remove_speckles(ink)
+
+    cleaned = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8), mode='L')
+    cleaned.info['dpi'] = (options['target_dpi'] or options['assumed_dpi'],) * 2
+    return cleaned
+
+
+def _preprocess_file_or_image(image, options):
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    return preprocess(image, options)
+
+
+def _preprocess_and_cache(image, options, cache_path):
+    cleaned = _preprocess_file_or_image(image, options)
+    if cache_path:
+        cleaned.save(cache_path, dpi=cleaned.info.get('dpi'))
+    return cleaned
+
+
+def _load_cached(cache_path):
+    with Image.open(cache_path) as cached:
+        cached.load()
+        return cached
+
+
+class Preprocessor:
+    """
+    Preprocesses pages in a process pool, optionally caching the cleaned images.
+
+    Cached files are keyed by page name, options and the size and mtime of the input
+    file the page came from (or, without one, the page's pixels), so changing either
+    reprocesses the page.
+    """
+
+    def __init__(self, options=None, workers=None, cache_dir=None, for_model=False):
+        """
+        Args:
+            options (dict): Overrides for DEFAULT_OPTIONS.
+            workers (int): Number of processes (defaults to the CPU count).
+            cache_dir (str): Folder for cleaned images; None disables caching.
+            for_model (bool): Whether the cleaned image should also be sent to the model.
+        """
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.cache_dir = cache_dir
+        self.for_model = for_model
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, image, page_file, source):
+        key = repr(sorted(self.options.items()))
+        if source is None and not isinstance(image, Image.Image):
+            source = image
+        if source is not None:
+            stat = os.stat(source)
+            key += f"{stat.st_size}:{stat.st_mtime_ns}"
+        else:
+            key += hashlib.sha1(image.tobytes()).hexdigest()
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]
+        return os.path.join(self.cache_dir, f"{os.path.splitext(page_file)[0]}_clean_{digest}.png")
+
+    def submit(self, image, page_file, source=None):
+        """
+        Start cleaning a page and return a future for the cleaned image.
+
+        Call this when the page is queued, so cleaning runs in the pool while earlier pages
+        are OCR'd. A cached page is returned as an already finished future.
+
+        Args:
+            image (str or PIL.Image.Image): Path of the page image, or the page itself.
+            page_file (str): Page file name, used for the cache file name.
+            source (str): Input file the page came from (a scan or PDF), for the cache key.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the cleaned PIL image.
+        """
+        cache_path = self._cache_path(image, page_file, source) if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            future = Future()
+            future.set_result(_load_cached(cache_path))
+            return future
+        return self.executor.submit(_preprocess_and_cache, image, self.options, cache_path)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def main(input_dir, output_dir, options, workers):
+    """Clean every image of a folder into another folder (to inspect or tune the settings)."""
+    os.makedirs(output_dir, exist_ok=True)
+    image_files = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.tif', '.tiff')))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        paths = [os.path.join(input_dir, f) for f in image_files]
+        cleaned_pages = executor.map(_preprocess_file_or_image, paths, [options] * len(paths))
+        for image_file, cleaned in tqdm(zip(image_files, cleaned_pages), total=len(image_files), desc="Preprocessing images"):
+            cleaned.save(os.path.join(output_dir, f"{os.path.splitext(image_file)[0]}.png"), dpi=cleaned.info.get('dpi'))
+
+
+def add_arguments(parser, prefix=''):
+    """Add the preprocessing options to an argparse parser (``prefix`` namespaces them in the processors)."""
+    parser.add_argument(f'--{prefix}dpi', type=int, default=DEFAULT_OPTIONS['target_dpi'], help='Resample pages to this DPI (0 keeps the original size).')
+    parser.add_argument(f'--{prefix}max-skew', type=float, default=DEFAULT_OPTIONS['max_skew'], help='Largest skew angle corrected, in degrees (0 disables deskew).')
+    parser.add_argument(f'--{prefix}window', type=int, default=DEFAULT_OPTIONS['window'], help='Sauvola window in pixels (0 disables binarisation).')
+    parser.add_argument(f'--{prefix}k', type=float, default=DEFAULT_OPTIONS['k'], help='Sauvola sensitivity.')
+    parser.add_argument(f'--{prefix}no-despeckle', action='store_true', help='Keep isolated ink pixels.')
+
+
+def options_from_args(args, prefix=''):
+    """Collect the options added by :func:`add_arguments` into a dict for :func:`preprocess`."""
+    values = vars(args)
+    prefix = prefix.replace('-', '_')
+    return {
+        'target_dpi': values[f'{prefix}dpi'],
+        'max_skew': values[f'{prefix}max_skew'],
+        'window': values[f'{prefix}window'],
+        'k': values[f'{prefix}k'],
+        'despeckle': not values[f'{prefix}no_despeckle'],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deskew, binarise and clean scans before OCR.")
+    parser.add_argument("-i", "--input_directory", required=True, help="Path to the directory containing the scans.")
+    parser.add_argument("-o", "--output_directory", required=True, help="Path to the directory where cleaned PNGs will be saved.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of processes (default: number of CPUs).")
+    add_arguments(parser)
+
+    args = parser.parse_args()
+    main(args.input_directory, args.output_directory, options_from_args(args), args.workers)
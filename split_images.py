@@ -1,21 +1,24 @@
 import os
 from PIL import Image
 
+def split_halves(img):
+    """Split an open page image into (right, left) halves; the right half is read first (part1)."""
+    width, height = img.size
+    
+    # Calculate the midpoint for horizontal split
+    midpoint = width // 2
+    # height = 2200
+    # Define the bounding boxes for the two halves
+    left_half_box = (0, 230, midpoint, height)
+    right_half_box = (midpoint, 230, width, height)
+    
+    # Crop the image into two halves
+    return img.crop(right_half_box), img.crop(left_half_box)
+
 def split_image_horizontally(image_path, output_dir):
     try:
         img = Image.open(image_path)
-        width, height = img.size
-        
-        # Calculate the midpoint for horizontal split
-        midpoint = width // 2
-        # height = 2200
-        # Define the bounding boxes for the two halves
-        left_half_box = (0, 230, midpoint, height)
-        right_half_box = (midpoint, 230, width, height)
-        
-        # Crop the image into two halves
-        left_half = img.crop(left_half_box)
-        right_half = img.crop(right_half_box)
+        right_half, left_half = split_halves(img)
         
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
@@ -0,0 +1,101 @@
+import os
+import time
+from PIL import Image
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # Not on Linux, or the optional package is not installed: fall back to polling.
+    INotify = None
+
+
+def is_complete_image(path):
+    """
+    Return True if the file is a fully written image (or a PDF with its end-of-file marker).
+
+    Images are decoded completely: ``Image.verify()`` does not read JPEG data, so a JPEG
+    cut off mid-write would pass it, while ``load()`` fails on the missing tail.
+    """
+    if path.lower().endswith('.pdf'):
+        try:
+            with open(path, 'rb') as f:
+                f.seek(max(0, os.path.getsize(path) - 1024))
+                return b'%%EOF' in f.read()
+        except OSError:
+            return False
+    try:
+        with Image.open(path) as img:
+            img.load()
+        return True
+    except Exception:
+        return False
+
+
+def _poll(folder_path, extensions, poll_interval, settle_seconds, stop_event):
+    """Yield files whose size and mtime have not changed for ``settle_seconds``."""
+    pending = {}  # path -> (signature, first time this signature was seen)
+    done = {}  # path -> signature that was yielded
+    while stop_event is None or not stop_event.is_set():
+        now = time.monotonic()
+        for entry in sorted(os.scandir(folder_path), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(extensions):
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if stat.st_size == 0 or done.get(entry.path) == signature:
+                continue
+            seen_signature, since = pending.get(entry.path, (None, now))
+            if seen_signature != signature:
+                pending[entry.path] = (signature, now)
+            elif now - since >= settle_seconds and is_complete_image(entry.path):
+                del pending[entry.path]
+                done[entry.path] = signature
+                yield entry.path
+        time.sleep(poll_interval)
+
+
+def _inotify(folder_path, extensions, poll_interval, stop_event):
+    """Yield files as soon as the writer closes them (or moves them into the folder)."""
+    inotify = INotify()
+    inotify.add_watch(folder_path, flags.CLOSE_WRITE | flags.MOVED_TO)
+    try:
+        # Files that were already complete before the watch started.
+        for name in sorted(os.listdir(folder_path)):
+            path = os.path.join(folder_path, name)
+            if name.lower().endswith(extensions) and is_complete_image(path):
+                yield path
+
+        while stop_event is None or not stop_event.is_set():
+            for event in inotify.read(timeout=int(poll_interval * 1000)):
+                path = os.path.join(folder_path, event.name)
+                if event.name.lower().endswith(extensions) and is_complete_image(path):
+                    yield path
+    finally:
+        inotify.close()
+
+
+def watch_images(folder_path, extensions=('.png', '.jpg', '.jpeg'), use_inotify=True,
+                 poll_interval=1.0, settle_seconds=2.0, stop_event=None):
+    """
+    Yield image files in a folder as they become fully written, starting with the ones already there.
+
+    inotify (via the optional ``inotify_simple`` package) reports a file the moment the
+    writer closes it. Polling is used when inotify is unavailable or disabled, e.g. for
+    network shares where inotify does not see remote writes; a file is then considered
+    written once its size and mtime are stable for ``settle_seconds``. In both modes a
+    file is only reported once PIL can fully decode it (PDFs: once their end-of-file marker is written).
+
+    Args:
+        folder_path (str): Folder to watch.
+        extensions (tuple): Lower-case file extensions to report.
+        use_inotify (bool): Use inotify when available.
+        poll_interval (float): Seconds between scans (or inotify read timeout).
+        settle_seconds (float): Polling mode only: how long a file must stay unchanged.
+        stop_event (threading.Event): Stops the generator once set.
+
+    Yields:
+        str: Path of a fully written image.
+    """
+    if use_inotify and INotify is not None:
+        yield from _inotify(folder_path, extensions, poll_interval, stop_event)
+    else:
+        yield from _poll(folder_path, extensions, poll_interval, settle_seconds, stop_event)